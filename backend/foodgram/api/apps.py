@@ -1,6 +1,16 @@
+import django
 from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
+
+from foodgram.db import check_connections_health, mark_connections_used
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        if django.VERSION < (4, 1):
+            request_started.connect(check_connections_health)
+            request_finished.connect(mark_connections_used)
+        from . import signals  # noqa: F401
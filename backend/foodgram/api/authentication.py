@@ -0,0 +1,122 @@
+"""Аутентификация по токену с кэшем.
+
+По умолчанию (TOKEN_CACHE_SHARED=True) токены с пользователями
+хранятся в общем кэше Django на TOKEN_CACHE_TTL секунд, и выход или
+изменение пользователя сбрасывают запись во всех процессах сразу.
+Если общего кэша нет или TOKEN_CACHE_SHARED=False, используется LRU
+внутри процесса: сброс виден только текущему процессу, поэтому запись
+живёт не дольше TOKEN_CACHE_LOCAL_TTL секунд.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from foodgram.cache import is_cache_shared
+from foodgram.metrics import REGISTRY
+
+TOKEN_CACHE_REQUESTS = REGISTRY.counter(
+    'foodgram_token_cache_requests_total',
+    'Обращения к кэшу токенов по результату.',
+)
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш с временем жизни записей."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_tokens = LRUCache(settings.TOKEN_CACHE_SIZE,
+                        settings.TOKEN_CACHE_LOCAL_TTL)
+
+
+def use_shared_cache():
+    return settings.TOKEN_CACHE_SHARED and is_cache_shared()
+
+
+def token_cache_key(key):
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_cached_token(key):
+    if use_shared_cache():
+        return cache.get(token_cache_key(key))
+    return local_tokens.get(key)
+
+
+def set_cached_token(token):
+    if use_shared_cache():
+        cache.set(token_cache_key(token.key), token, settings.TOKEN_CACHE_TTL)
+    else:
+        local_tokens.set(token.key, token)
+
+
+def invalidate_token(key):
+    local_tokens.delete(key)
+    if use_shared_cache():
+        cache.delete(token_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к базе для известных токенов."""
+
+    def authenticate_credentials(self, key):
+        token = get_cached_token(key)
+        if token is None:
+            TOKEN_CACHE_REQUESTS.inc(result='miss')
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            set_cached_token(token)
+        else:
+            TOKEN_CACHE_REQUESTS.inc(result='hit')
+        # Запрос может менять request.user, кэшированный объект
+        # не должен этого видеть.
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return token.user, token
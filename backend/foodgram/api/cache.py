@@ -0,0 +1,122 @@
+"""Кэш представлений рецептов.
+
+В кэше хранится часть рецепта, одинаковая для всех пользователей:
+автор, теги, ингредиенты, текст и относительный путь к картинке.
+Флаги is_favorited, is_in_shopping_cart и author.is_subscribed
+вычисляются для каждого запроса отдельно и подставляются сверху.
+Ключ включает Recipe.updated_at, поэтому изменённый рецепт просто
+получает новый ключ, а старый вытесняется по таймауту.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+
+from recipes.models import Favorite, Shoppingcart, Subscription
+from .serializers import RecipeCacheSerializer
+
+UserFlags = namedtuple('UserFlags', ('favorited', 'in_cart', 'subscribed'))
+
+
+def recipe_version(recipe):
+    return int(recipe.updated_at.timestamp() * 1_000_000)
+
+
+def recipe_cache_key(recipe):
+    return f'recipe:{recipe.pk}:{recipe_version(recipe)}'
+
+
+def get_recipe_data(recipe):
+    """Общая часть представления рецепта из кэша или сериализатора."""
+    key = recipe_cache_key(recipe)
+    data = cache.get(key)
+    if data is None:
+        data = RecipeCacheSerializer(recipe).data
+        cache.set(key, data, settings.RECIPE_CACHE_TIMEOUT)
+    return data
+
+
+def get_recipes_data(recipes):
+    """Общие части представлений для страницы рецептов.
+
+    Кэш читается и пишется одним обращением на страницу, связанные
+    данные подгружаются только для рецептов, которых нет в кэше.
+    """
+    keys = {recipe.pk: recipe_cache_key(recipe) for recipe in recipes}
+    cached = cache.get_many(keys.values())
+    missed = [recipe for recipe in recipes if keys[recipe.pk] not in cached]
+    if missed:
+        prefetch_related_objects(
+            missed, 'author', 'tags', 'recipeingredients__ingredient'
+        )
+        fresh = {
+            keys[recipe.pk]: RecipeCacheSerializer(recipe).data
+            for recipe in missed
+        }
+        cache.set_many(fresh, settings.RECIPE_CACHE_TIMEOUT)
+        cached.update(fresh)
+    return [cached[keys[recipe.pk]] for recipe in recipes]
+
+
+def get_user_flags(user, recipes):
+    """Избранное, корзина и подписки пользователя для набора рецептов."""
+    if not user.is_authenticated:
+        return UserFlags(set(), set(), set())
+    recipe_ids = [recipe.pk for recipe in recipes]
+    return UserFlags(
+        favorited=set(Favorite.objects.filter(
+            user=user, recipe__in=recipe_ids
+        ).values_list('recipe_id', flat=True)),
+        in_cart=set(Shoppingcart.objects.filter(
+            user=user, recipe__in=recipe_ids
+        ).values_list('recipe_id', flat=True)),
+        subscribed=set(Subscription.objects.filter(
+            user=user, author__in={recipe.author_id for recipe in recipes}
+        ).values_list('author_id', flat=True)),
+    )
+
+
+def represent_recipe(data, flags, request):
+    """Собирает ответ в том же виде, что и RecipeGetSerializer."""
+    author = data['author']
+    image = data['image']
+    return {
+        'id': data['id'],
+        'author': {
+            'first_name': author['first_name'],
+            'last_name': author['last_name'],
+            'is_subscribed': author['id'] in flags.subscribed,
+            'id': author['id'],
+            'username': author['username'],
+            'email': author['email'],
+        },
+        'tags': data['tags'],
+        'ingredients': data['ingredients'],
+        'is_favorited': data['id'] in flags.favorited,
+        'is_in_shopping_cart': data['id'] in flags.in_cart,
+        'image': request.build_absolute_uri(image) if image else image,
+        'name': data['name'],
+        'cooking_time': data['cooking_time'],
+        'text': data['text'],
+    }
+
+
+def represent_recipes(recipes, request):
+    """Список рецептов в виде RecipeGetSerializer(many=True).data."""
+    flags = get_user_flags(request.user, recipes)
+    return [
+        represent_recipe(data, flags, request)
+        for data in get_recipes_data(recipes)
+    ]
+
+
+def recipe_etag(recipe, flags):
+    """ETag учитывает версию рецепта и флаги текущего пользователя."""
+    return '"{}-{}-{:d}{:d}{:d}"'.format(
+        recipe.pk,
+        recipe_version(recipe),
+        recipe.pk in flags.favorited,
+        recipe.pk in flags.in_cart,
+        recipe.author_id in flags.subscribed,
+    )
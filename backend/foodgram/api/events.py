@@ -0,0 +1,292 @@
+"""События об изменении избранного, корзины и подписок пользователя.
+
+Представления публикуют событие после коммита, поток /api/events/
+отдаёт события всех устройств пользователя в формате server-sent
+events, и клиентам не нужно опрашивать отфильтрованный список рецептов.
+
+Брокер задаётся настройкой EVENTS_BROKER:
+CacheBroker (по умолчанию) — журнал событий пользователя в общем
+кэше: номер версии и события по номерам, подписчик проверяет версию
+раз в EVENTS_POLL_INTERVAL секунд. Это одно чтение из кэша вместо
+запроса к базе;
+LocalBroker — очереди в памяти процесса, подходит, только когда API
+работает в одном процессе (runserver, один воркер gunicorn).
+Воркер gunicorn не запускается, если процессов несколько, а брокер
+не видит событий других процессов, см. check_workers().
+
+У пользователя не больше EVENTS_MAX_STREAMS открытых потоков: каждый
+поток занимает поток воркера на EVENTS_STREAM_TIMEOUT секунд.
+
+Если события потеряны (переполнилась очередь, журнал вытеснен из
+кэша), клиент получает событие resync и перечитывает данные через
+/api/sync/.
+"""
+import itertools
+import json
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+from foodgram.cache import is_cache_shared
+
+# Сколько событий хранится для одного подписчика или в журнале кэша.
+MAX_EVENTS = 100
+# Время жизни события в журнале кэша, секунды.
+EVENT_TTL = 300
+# Пауза перед переподключением клиента, миллисекунды.
+RETRY_MS = 3000
+
+VERSION_KEY = 'events:{}:version'
+EVENT_KEY = 'events:{}:{}'
+STREAMS_KEY = 'events:{}:streams'
+
+
+class StreamLimitExceeded(Exception):
+    """У пользователя уже открыто EVENTS_MAX_STREAMS потоков."""
+
+
+class LocalSubscription:
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.events = queue.Queue(MAX_EVENTS)
+        self.lost = False
+
+    def put(self, event_id, event):
+        try:
+            self.events.put_nowait((event_id, event))
+        except queue.Full:
+            self.lost = True
+
+    def wait(self, timeout):
+        """События, пришедшие за timeout секунд."""
+        try:
+            events = [self.events.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """Очереди подписчиков в памяти процесса.
+
+    Номера событий действуют только в пределах процесса, поэтому
+    Last-Event-ID при переподключении не учитывается.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._counter = itertools.count(1)
+
+    def publish(self, user_id, event):
+        with self._lock:
+            event_id = next(self._counter)
+            for subscription in self._subscriptions.get(user_id, ()):
+                subscription.put(event_id, event)
+
+    def subscribe(self, user_id, last_id=None):
+        subscription = LocalSubscription(self, user_id)
+        with self._lock:
+            subscriptions = self._subscriptions.setdefault(user_id, set())
+            if len(subscriptions) >= settings.EVENTS_MAX_STREAMS:
+                raise StreamLimitExceeded
+            subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+
+class CacheSubscription:
+
+    def __init__(self, user_id, last_id):
+        self.user_id = user_id
+        version = cache.get(VERSION_KEY.format(user_id), 0)
+        self.position = version if last_id is None else last_id
+        # Событие, номер которого уже выдан, а запись ещё не появилась.
+        self.missing = None
+        self.lost = False
+        self.closed = False
+
+    def wait(self, timeout):
+        """События, пришедшие за timeout секунд."""
+        deadline = time.monotonic() + timeout
+        while True:
+            version = cache.get(VERSION_KEY.format(self.user_id), 0)
+            if version != self.position:
+                events = self.read(version)
+                if events or self.lost:
+                    return events
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            time.sleep(min(settings.EVENTS_POLL_INTERVAL, remaining))
+
+    def read(self, version):
+        if not 0 <= version - self.position <= MAX_EVENTS:
+            self.lost, self.position = True, version
+            return []
+        numbers = range(self.position + 1, version + 1)
+        found = cache.get_many(
+            [EVENT_KEY.format(self.user_id, number) for number in numbers]
+        )
+        events = []
+        for number in numbers:
+            event = found.get(EVENT_KEY.format(self.user_id, number))
+            if event is None:
+                # Публикация между incr и set: запись ждём один опрос,
+                # потом считаем её вытесненной.
+                if self.missing != number:
+                    self.missing = number
+                    break
+                self.lost = True
+                continue
+            events.append((number, event))
+            self.position = number
+        if self.lost:
+            self.position = version
+        return events
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            cache.decr(STREAMS_KEY.format(self.user_id))
+        except ValueError:
+            # Счётчик истёк, пока поток был открыт.
+            pass
+
+
+class CacheBroker:
+    """Журнал событий пользователя в кэше, общем для всех процессов."""
+
+    @property
+    def shared(self):
+        return is_cache_shared()
+
+    def publish(self, user_id, event):
+        key = VERSION_KEY.format(user_id)
+        cache.add(key, 0, None)
+        version = cache.incr(key)
+        cache.set(EVENT_KEY.format(user_id, version), event, EVENT_TTL)
+
+    def subscribe(self, user_id, last_id=None):
+        key = STREAMS_KEY.format(user_id)
+        ttl = settings.EVENTS_STREAM_TIMEOUT + 60
+        # Счётчик живёт дольше потока, поэтому не закрытый из-за
+        # падения процесса поток со временем перестаёт учитываться.
+        cache.add(key, 0, ttl)
+        try:
+            streams = cache.incr(key)
+        except ValueError:
+            # Запись вытеснена между add и incr.
+            cache.set(key, 1, ttl)
+            streams = 1
+        if streams > settings.EVENTS_MAX_STREAMS:
+            cache.decr(key)
+            raise StreamLimitExceeded
+        return CacheSubscription(user_id, last_id)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.EVENTS_BROKER)()
+    return _broker
+
+
+def check_workers(workers):
+    """Не даёт запустить несколько процессов с брокером одного процесса.
+
+    Вызывается из gunicorn.conf.py: иначе события терялись бы молча,
+    если изменение и поток попали в разные воркеры.
+    """
+    if workers > 1 and not get_broker().shared:
+        raise ImproperlyConfigured(
+            f'{settings.EVENTS_BROKER} does not deliver events between '
+            f'{workers} worker processes: use api.events.CacheBroker with '
+            'a shared CACHE_BACKEND or run a single worker.'
+        )
+
+
+def publish_event(user_id, model, action, object_id):
+    """Публикует событие после коммита текущей транзакции.
+
+    model — имя модели (favorite, shoppingcart, subscription),
+    action — added или removed, object_id — id рецепта или автора.
+    """
+    event = {'type': model, 'action': action, 'id': object_id}
+    transaction.on_commit(lambda: get_broker().publish(user_id, event))
+
+
+def format_event(name, data, event_id=None):
+    lines = [] if event_id is None else [f'id: {event_id}']
+    lines.append(f'event: {name}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventStream:
+    """Поток событий подписки в формате text/event-stream.
+
+    Поток закрывается через EVENTS_STREAM_TIMEOUT секунд, клиент
+    переподключается сам, передавая Last-Event-ID. close() вызывает
+    сервер после ответа, даже если поток так и не начал читаться,
+    поэтому подписка не остаётся висеть в лимите пользователя.
+    """
+
+    def __init__(self, subscription):
+        self.subscription = subscription
+
+    def __iter__(self):
+        # Соединение с базой не нужно потоку и не должно занимать пул.
+        connections.close_all()
+        deadline = time.monotonic() + settings.EVENTS_STREAM_TIMEOUT
+        yield f'retry: {RETRY_MS}\n\n'
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            events = self.subscription.wait(
+                min(settings.EVENTS_HEARTBEAT, remaining)
+            )
+            if self.subscription.lost:
+                self.subscription.lost = False
+                yield format_event('resync', {})
+            for event_id, event in events:
+                yield format_event(event['type'], event, event_id)
+            if not events:
+                # Комментарий не даёт прокси закрыть соединение.
+                yield ': ping\n\n'
+
+    def close(self):
+        self.subscription.close()
@@ -1,17 +1,36 @@
 from urllib.parse import unquote
 
+from django.db.models import Exists, OuterRef
 from django_filters.filters import CharFilter
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            Shoppingcart, Tag)
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    """Список чисел через запятую."""
 
 
 class RecipeFilter(FilterSet):
+    """Фильтры рецептов.
+
+    Связанные таблицы проверяются через EXISTS, а не через JOIN:
+    строки рецептов не размножаются, DISTINCT не нужен, и каждое
+    условие проверяется по составному индексу связи.
+    """
+    ORDERING = {
+        'cooking_time': ('cooking_time', 'id'),
+        '-cooking_time': ('-cooking_time', '-id'),
+        'popularity': ('favorites_count', 'id'),
+        '-popularity': ('-favorites_count', '-id'),
+    }
 
     tags = filters.ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
         field_name='tags__slug',
         to_field_name='slug',
+        method='filter_tags',
     )
     is_favorited = filters.BooleanFilter(
         method='get_is_favorited'
@@ -19,21 +38,68 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    min_cooking_time = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='gte'
+    )
+    max_cooking_time = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='lte'
+    )
+    ingredients = NumberInFilter(method='filter_ingredients')
+    exclude_ingredients = NumberInFilter(
+        method='filter_exclude_ingredients'
+    )
+    ordering = filters.ChoiceFilter(
+        choices=[(value, value) for value in ORDERING],
+        method='order',
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'min_cooking_time', 'max_cooking_time', 'ingredients',
+                  'exclude_ingredients', 'ordering')
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value
+        )))
 
     def get_is_favorited(self, queryset, name, value):
-        if self.request.user.is_authenticated:
-            return queryset.filter(favoriterecipe__user=self.request.user)
+        if value and self.request.user.is_authenticated:
+            return queryset.filter(Exists(Favorite.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk')
+            )))
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
-        if self.request.user.is_authenticated:
-            return queryset.filter(shoppingrecipe__user=self.request.user)
+        if value and self.request.user.is_authenticated:
+            return queryset.filter(Exists(Shoppingcart.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk')
+            )))
+        return queryset
+
+    def filter_ingredients(self, queryset, name, value):
+        """Рецепты, в которых есть все перечисленные ингредиенты."""
+        for ingredient_id in set(value):
+            queryset = queryset.filter(Exists(
+                RecipeIngredients.objects.filter(
+                    recipe=OuterRef('pk'), ingredient=ingredient_id
+                )
+            ))
         return queryset
 
+    def filter_exclude_ingredients(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(~Exists(RecipeIngredients.objects.filter(
+            recipe=OuterRef('pk'), ingredient__in=value
+        )))
+
+    def order(self, queryset, name, value):
+        return queryset.order_by(*self.ORDERING[value])
+
 
 class DecodedCharFilter(CharFilter):
     def filter(self, qs, value):
@@ -0,0 +1,179 @@
+"""Инвертированный индекс «ингредиент → рецепты» в памяти процесса.
+
+Индекс нужен для поиска рецептов по имеющимся продуктам: вместо
+группировки RecipeIngredients в базе достаточно пройти по спискам
+рецептов выбранных ингредиентов. Списки хранятся в array('l').
+
+Изменения рецептов записываются в кэш как журнал: номер версии и id
+рецепта. Перед поиском процесс догоняет версию и перечитывает только
+изменённые рецепты. Если журнал потерян или индекс старше
+INGREDIENT_INDEX_MAX_AGE (например, после seed_data, который
+сигналов не отправляет), индекс строится заново в фоновом потоке,
+а поиск до тех пор идёт по старому индексу.
+
+Журнал виден другим процессам только через общий кэш: с locmem
+воркер узнаёт о чужих изменениях лишь при плановой пересборке
+(предупреждение jobs.W001, оно же пишется в журнал при первой сборке).
+"""
+import logging
+import threading
+import time
+from array import array
+from collections import Counter
+from itertools import chain
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from foodgram.batching import iterate_values
+from jobs.checks import check_shared_cache
+from recipes.models import RecipeIngredients
+
+VERSION_KEY = 'ingredient-index:version'
+CHANGE_KEY = 'ingredient-index:change:{}'
+# Сколько изменений догонять по журналу, прежде чем строить заново.
+MAX_CHANGES = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def mark_recipe_changed(recipe_id):
+    cache.add(VERSION_KEY, 0, None)
+    version = cache.incr(VERSION_KEY)
+    cache.set(CHANGE_KEY.format(version), recipe_id,
+              settings.INGREDIENT_INDEX_MAX_AGE)
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self.postings = {}
+        self.recipes = {}
+        self.version = None
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+        # Индекс строит не больше одного потока сразу.
+        self._build_lock = threading.Lock()
+
+    def add(self, recipe_id, ingredient_ids):
+        self.recipes[recipe_id] = array('l', ingredient_ids)
+        for ingredient_id in ingredient_ids:
+            self.postings.setdefault(ingredient_id, array('l')).append(
+                recipe_id
+            )
+
+    def remove(self, recipe_id):
+        for ingredient_id in self.recipes.pop(recipe_id, ()):
+            self.postings[ingredient_id].remove(recipe_id)
+
+    def load(self, recipe_ids=None):
+        """Пары рецепт-ингредиент из базы, сгруппированные по рецепту.
+
+        Читаются из default: реплика может ещё не содержать изменение,
+        о котором уже записано в журнал.
+        """
+        queryset = RecipeIngredients.objects.using('default').order_by()
+        if recipe_ids is not None:
+            queryset = queryset.filter(recipe_id__in=recipe_ids)
+        recipes = {}
+        for recipe_id, ingredient_id in iterate_values(
+            queryset, 'recipe_id', 'ingredient_id'
+        ):
+            recipes.setdefault(recipe_id, []).append(ingredient_id)
+        return recipes
+
+    def rebuild(self):
+        """Строит индекс заново и подменяет им текущий.
+
+        Поиск до подмены работает по старому индексу.
+        """
+        if self.version is None:
+            for warning in check_shared_cache():
+                logger.warning('%s (%s)', warning.msg, warning.id)
+        version = cache.get(VERSION_KEY, 0)
+        fresh = IngredientIndex()
+        for recipe_id, ingredient_ids in self.load().items():
+            fresh.add(recipe_id, ingredient_ids)
+        with self._lock:
+            self.postings, self.recipes = fresh.postings, fresh.recipes
+            self.version = version
+            self.built_at = time.monotonic()
+
+    def start_rebuild(self):
+        """Запускает rebuild() в фоновом потоке, если он ещё не идёт."""
+        if not self._build_lock.acquire(blocking=False):
+            return
+        threading.Thread(
+            target=self._rebuild_in_background, name='ingredient-index',
+            daemon=True,
+        ).start()
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception('Ingredient index rebuild failed')
+        finally:
+            self._build_lock.release()
+            connections.close_all()
+
+    def apply_changes(self, version):
+        with self._lock:
+            base = self.version
+        keys = [CHANGE_KEY.format(number)
+                for number in range(base + 1, version + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return False
+        changed = set(changes.values())
+        fresh = self.load(changed)
+        with self._lock:
+            # Пока читали базу, индекс мог догнать другой поток.
+            if self.version != base:
+                return True
+            for recipe_id in changed:
+                self.remove(recipe_id)
+                if recipe_id in fresh:
+                    self.add(recipe_id, fresh[recipe_id])
+            self.version = version
+        return True
+
+    def refresh(self):
+        if self.version is None:
+            # Индекса ещё нет, и искать не по чему: первый запрос ждёт
+            # сборки. Обычно её заранее запускает gunicorn.conf.py.
+            with self._build_lock:
+                if self.version is None:
+                    self.rebuild()
+            return
+        version = cache.get(VERSION_KEY, 0)
+        if (version < self.version or version - self.version > MAX_CHANGES
+                or time.monotonic() - self.built_at
+                > settings.INGREDIENT_INDEX_MAX_AGE):
+            self.start_rebuild()
+        elif version > self.version and not self.apply_changes(version):
+            self.start_rebuild()
+
+    def search(self, ingredient_ids, min_coverage=0):
+        """Рецепты с долей имеющихся ингредиентов, лучшие первыми.
+
+        Возвращает список (id рецепта, найдено, всего ингредиентов).
+        """
+        self.refresh()
+        with self._lock:
+            matches = Counter(chain.from_iterable(
+                self.postings.get(ingredient_id, ())
+                for ingredient_id in set(ingredient_ids)
+            ))
+            results = [
+                (recipe_id, found, len(self.recipes[recipe_id]))
+                for recipe_id, found in matches.items()
+                if found >= min_coverage * len(self.recipes[recipe_id])
+            ]
+        results.sort(key=lambda item: (item[1] / item[2], item[1], item[0]),
+                     reverse=True)
+        return results
+
+
+INDEX = IngredientIndex()
@@ -0,0 +1,15 @@
+"""Фоновые задачи API, выполняются командой run_jobs."""
+from jobs.queue import job
+from recipes.models import Recipe
+from .cache import get_recipes_data
+from .shopping_list import get_cart_state, save_shopping_list
+
+
+@job('warm_recipe_cache')
+def warm_recipe_cache(recipe_id):
+    get_recipes_data(list(Recipe.objects.filter(pk=recipe_id)))
+
+
+@job('render_shopping_list')
+def render_shopping_list(user_id):
+    save_shopping_list(user_id, get_cart_state(user_id))
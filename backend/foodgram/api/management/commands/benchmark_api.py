@@ -0,0 +1,327 @@
+import itertools
+import json
+import platform
+import re
+import statistics
+import tempfile
+import time
+from urllib.parse import urlencode
+
+import django
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connection
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import prefetch_related_objects
+from django.http import QueryDict
+from django.test import Client, RequestFactory
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.cache import UserFlags, represent_recipe
+from api.filters import RecipeFilter
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeCacheSerializer, RecipeGetSerializer
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from users.models import User
+
+# Картинка 1x1 пиксель для создания рецептов через API.
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+RECIPE_FILTERS = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+SEED_OPTIONS = ('seed', 'users', 'recipes', 'tags', 'ingredients_per_recipe',
+                'favorites', 'carts', 'subscriptions')
+
+
+def plan_problems(plan, vendor):
+    """Полные просмотры связанных таблиц и сортировки в плане запроса.
+
+    Полный просмотр recipes_recipe допустим: без фильтров страница
+    читается по первичному ключу и обрывается на LIMIT.
+    """
+    if vendor == 'postgresql':
+        scans = re.findall(r'Seq Scan on (\w+)', plan)
+        sorts = re.findall(r'^\s*(?:->\s*)?Sort\b', plan, re.MULTILINE)
+    else:
+        scans = re.findall(r'SCAN (?:TABLE )?(\w+)(?! USING)\s*$', plan,
+                           re.MULTILINE)
+        sorts = re.findall(r'USE TEMP B-TREE FOR ORDER BY', plan)
+    return {
+        'full_scans': sorted(set(scans) - {Recipe._meta.db_table}),
+        'sorts': len(sorts),
+    }
+
+
+def filter_combinations(user, tags):
+    """Все сочетания фильтров RecipeFilter, включая пустое."""
+    values = {
+        'author': user.id,
+        'tags': [tag.slug for tag in tags],
+        'is_favorited': 1,
+        'is_in_shopping_cart': 1,
+    }
+    for size in range(len(RECIPE_FILTERS) + 1):
+        for names in itertools.combinations(RECIPE_FILTERS, size):
+            yield '+'.join(names) or 'none', {
+                name: values[name] for name in names
+            }
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks main API endpoints on a seeded test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--tags', type=int, default=5)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help="favorites per user")
+        parser.add_argument('--carts', type=int, default=5,
+                            help="shopping cart recipes per user")
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help="subscriptions per user")
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--output', type=str,
+                            help="write the JSON report to this file")
+        parser.add_argument('--keepdb', action='store_true',
+                            help="keep the test database between runs")
+        parser.add_argument(
+            '--check-plans', action='store_true',
+            help="fail if recipe filters scan related tables or sort "
+                 "without an index"
+        )
+
+    def measure(self, name, request):
+        """Время, пропускная способность и число запросов к БД."""
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        assert response.status_code < 400, (name, response.status_code)
+        # Журнал запросов очищается в начале каждого HTTP-запроса,
+        # поэтому число запросов нужно прочитать сразу.
+        query_count = len(queries)
+        timings = []
+        started = time.perf_counter()
+        for _ in range(self.iterations):
+            request_started = time.perf_counter()
+            request()
+            timings.append((time.perf_counter() - request_started) * 1000)
+        elapsed = time.perf_counter() - started
+        timings.sort()
+        self.results[name] = {
+            'queries': query_count,
+            'mean_ms': round(statistics.mean(timings), 2),
+            'p50_ms': round(timings[len(timings) // 2], 2),
+            'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2),
+            'rps': round(self.iterations / elapsed, 1),
+        }
+        if self.verbosity > 1:
+            self.stderr.write(f'{name}: {self.results[name]}')
+
+    def time_call(self, function):
+        timings = []
+        for _ in range(self.iterations):
+            started = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - started) * 1000)
+        return round(statistics.median(timings), 2)
+
+    def measure_serialization(self, size=100):
+        """Сериализация и рендеринг страницы рецептов без учёта БД."""
+        recipes = list(Recipe.objects.all()[:size])
+        prefetch_related_objects(
+            recipes, 'author', 'tags', 'recipeingredients__ingredient'
+        )
+        request = Request(RequestFactory().get('/'))
+        request.user = AnonymousUser()
+        flags = UserFlags(set(), set(), set())
+        data = RecipeGetSerializer(
+            recipes, many=True, context={'request': request}
+        ).data
+        self.results[f'serialization[{len(recipes)} recipes]'] = {
+            'drf_serializer_ms': self.time_call(
+                lambda: RecipeGetSerializer(
+                    recipes, many=True, context={'request': request}
+                ).data
+            ),
+            'light_serializer_ms': self.time_call(
+                lambda: [
+                    represent_recipe(item, flags, request)
+                    for item in RecipeCacheSerializer(recipes, many=True).data
+                ]
+            ),
+            'json_renderer_ms': self.time_call(
+                lambda: JSONRenderer().render(data)
+            ),
+            'fast_json_renderer_ms': self.time_call(
+                lambda: FastJSONRenderer().render(data)
+            ),
+        }
+
+    def plan_scenarios(self, user, tags):
+        ingredients = list(RecipeIngredients.objects.values_list(
+            'ingredient_id', flat=True
+        )[:3])
+        include = ','.join(map(str, ingredients[:2]))
+        return {
+            'cooking_time_range': {'min_cooking_time': 10,
+                                   'max_cooking_time': 30},
+            'ingredients': {'ingredients': include},
+            'exclude_ingredients': {
+                'exclude_ingredients': str(ingredients[2])
+            },
+            'favorited+cart+tags': {
+                'is_favorited': 1, 'is_in_shopping_cart': 1,
+                'tags': [tag.slug for tag in tags],
+            },
+            'ordering[cooking_time]': {'ordering': 'cooking_time'},
+            'ordering[-popularity]': {'ordering': '-popularity'},
+            'combined': {
+                'tags': [tag.slug for tag in tags],
+                'ingredients': include,
+                'max_cooking_time': 120,
+                'is_favorited': 1,
+                'ordering': '-popularity',
+            },
+        }
+
+    def check_plans(self, user, tags, strict):
+        """EXPLAIN первой страницы для фильтров RecipeFilter."""
+        request = Request(RequestFactory().get('/'))
+        request.user = user
+        plans = {}
+        for name, params in self.plan_scenarios(user, tags).items():
+            filterset = RecipeFilter(
+                QueryDict(urlencode(params, doseq=True)),
+                queryset=Recipe.objects.all(),
+                request=request,
+            )
+            plan = filterset.qs[:6].explain()
+            plans[name] = plan_problems(plan, connection.vendor)
+            if self.verbosity > 1:
+                self.stderr.write(f'{name}:\n{plan}')
+        self.results['query_plans'] = plans
+        if strict:
+            failed = {
+                name: problems for name, problems in plans.items()
+                if problems['full_scans'] or (
+                    name.startswith('ordering') and problems['sorts']
+                )
+            }
+            if failed:
+                raise CommandError(f'Query plans are not index-driven: '
+                                   f'{failed}')
+
+    def run_scenarios(self, client, user):
+        tags = list(Tag.objects.all()[:2])
+        for name, params in filter_combinations(user, tags):
+            self.measure(
+                f'recipes.list[{name}]',
+                lambda: client.get('/api/recipes/', params),
+            )
+        recipe = Recipe.objects.filter(author=user).first()
+        self.measure(
+            'recipes.retrieve',
+            lambda: client.get(f'/api/recipes/{recipe.id}/'),
+        )
+        ingredient_ids = list(
+            Ingredient.objects.values_list('id', flat=True)[:5]
+        )
+        payload = {
+            'ingredients': [{'id': id, 'amount': 10}
+                            for id in ingredient_ids],
+            'tags': [tag.id for tag in tags],
+            'image': IMAGE,
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 15,
+        }
+        self.measure(
+            'recipes.create',
+            lambda: client.post('/api/recipes/', payload,
+                                content_type='application/json'),
+        )
+        self.measure(
+            'recipes.partial_update',
+            lambda: client.patch(f'/api/recipes/{recipe.id}/', payload,
+                                 content_type='application/json'),
+        )
+        self.measure(
+            'recipes.download_shopping_cart',
+            lambda: client.get('/api/recipes/download_shopping_cart/'),
+        )
+        self.measure(
+            'users.subscriptions',
+            lambda: client.get('/api/users/subscriptions/',
+                               {'recipes_limit': 3}),
+        )
+        self.measure(
+            'recipes.list[cooking_time+ingredients+popularity]',
+            lambda: client.get('/api/recipes/', {
+                'max_cooking_time': 60,
+                'ingredients': ingredient_ids[0],
+                'ordering': '-popularity',
+            }),
+        )
+        self.measure(
+            'ingredients.search',
+            lambda: client.get('/api/ingredients/', {'name': 'са'}),
+        )
+
+    def handle(self, *args, **options):
+        self.iterations = options['iterations']
+        self.verbosity = options['verbosity']
+        self.results = {}
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, keepdb=options['keepdb']
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(MEDIA_ROOT=media_root,
+                                      PROTECTED_MEDIA_ROOT=media_root):
+                if not Recipe.objects.exists():
+                    seed_started = time.perf_counter()
+                    call_command(
+                        'seed_data', verbosity=0, workers=1,
+                        **{name: options[name] for name in SEED_OPTIONS}
+                    )
+                    self.results['seed_seconds'] = round(
+                        time.perf_counter() - seed_started, 2
+                    )
+                user = User.objects.filter(
+                    recipes__isnull=False, shoppingrecipe__isnull=False
+                ).first()
+                token, _ = Token.objects.get_or_create(user=user)
+                client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+                self.run_scenarios(client, user)
+                self.check_plans(user, list(Tag.objects.all()[:2]),
+                                 options['check_plans'])
+                self.measure_serialization()
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+
+        report = {
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'dataset': {name: options[name] for name in SEED_OPTIONS},
+            'iterations': self.iterations,
+            'results': self.results,
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
@@ -0,0 +1,78 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+STARTUP_SCRIPT = '''
+import json
+import os
+import time
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+from django.core.wsgi import get_wsgi_application
+
+application = get_wsgi_application()
+loaded = time.perf_counter()
+
+environ = {{'PATH_INFO': {path!r}, 'wsgi.input': BytesIO()}}
+setup_testing_defaults(environ)
+statuses = []
+
+
+def start_response(status, headers):
+    statuses.append(status)
+
+
+response = application(environ, start_response)
+b''.join(response)
+finished = time.perf_counter()
+
+print(json.dumps({{
+    'import': loaded - started,
+    'first_request': finished - loaded,
+    'status': statuses[0],
+}}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measures cold start: app import and first request latency'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5,
+                            help="number of cold starts")
+        parser.add_argument('--path', type=str, default='/api/tags/',
+                            help="path of the first request")
+
+    def run_once(self, path):
+        result = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT.format(path=path)],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return json.loads(result.stdout.splitlines()[-1])
+
+    def handle(self, *args, **options):
+        runs = [self.run_once(options['path'])
+                for _ in range(options['runs'])]
+        report = {
+            'runs': len(runs),
+            'status': runs[-1]['status'],
+        }
+        for metric in ('import', 'first_request'):
+            values = [run[metric] * 1000 for run in runs]
+            report[f'{metric}_ms'] = {
+                'median': round(statistics.median(values), 2),
+                'min': round(min(values), 2),
+                'max': round(max(values), 2),
+            }
+        self.stdout.write(json.dumps(report, indent=2))
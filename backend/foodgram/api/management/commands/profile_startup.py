@@ -0,0 +1,99 @@
+import json
+import re
+import shlex
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+SETUP_SCRIPT = '''
+import os
+import sys
+import time
+
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+import django
+
+django.setup()
+ready = time.perf_counter()
+{extra}
+print(f'app_ready_ms={{(ready - started) * 1000:.2f}}', file=sys.stderr)
+'''
+
+IMPORT_TIME_LINE = re.compile(
+    r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$'
+)
+
+
+def parse_import_time(output):
+    """Разбирает вывод -X importtime в список (модуль, self, cumulative)."""
+    modules = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, module = match.groups()
+            modules.append((module, int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Reports per-module import time and app-ready time'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--manage',
+            type=str,
+            help="profile a manage.py invocation, e.g. 'load_json_data -h'"
+        )
+        parser.add_argument(
+            '--urls',
+            action='store_true',
+            help="also import the URLconf like a web worker does"
+        )
+        parser.add_argument('--top', type=int, default=20,
+                            help="number of modules to report")
+
+    def get_argv(self, options):
+        if options['manage']:
+            return ['manage.py', *shlex.split(options['manage'])]
+        extra = ''
+        if options['urls']:
+            extra = f'import {settings.ROOT_URLCONF}'
+        return ['-c', SETUP_SCRIPT.format(extra=extra)]
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', *self.get_argv(options)],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        modules = parse_import_time(result.stderr)
+        packages = Counter()
+        for module, self_us, _ in modules:
+            packages[module.split('.')[0]] += self_us
+        top = options['top']
+        report = {
+            'modules_imported': len(modules),
+            'total_import_ms': round(
+                sum(self_us for _, self_us, _ in modules) / 1000, 2
+            ),
+            'packages_ms': {
+                package: round(self_us / 1000, 2)
+                for package, self_us in packages.most_common(top)
+            },
+            'slowest_modules_ms': {
+                module: round(cumulative_us / 1000, 2)
+                for module, _, cumulative_us in sorted(
+                    modules, key=lambda item: item[2], reverse=True
+                )[:top]
+            },
+        }
+        app_ready = re.search(r'app_ready_ms=([\d.]+)', result.stderr)
+        if app_ready:
+            report['app_ready_ms'] = float(app_ready.group(1))
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,35 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ('Deletes files in PROTECTED_MEDIA_ROOT older than '
+            'PROTECTED_FILE_TTL, keeping the newest file of each directory')
+    requires_system_checks = []
+
+    def handle(self, *args, **options):
+        expired = time.time() - settings.PROTECTED_FILE_TTL
+        deleted = 0
+        for directory, _, names in os.walk(settings.PROTECTED_MEDIA_ROOT):
+            files = []
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    files.append((os.stat(path).st_mtime, path))
+                except FileNotFoundError:
+                    continue
+            # Самый новый файл — актуальная версия, на него ссылается кэш.
+            files.sort()
+            for modified, path in files[:-1]:
+                if modified >= expired:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                deleted += 1
+        if options['verbosity'] > 0:
+            self.stdout.write(f'Deleted {deleted} files')
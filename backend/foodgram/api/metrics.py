@@ -0,0 +1,20 @@
+"""Метрики HTTP-запросов и SQL, их собирает api.middleware."""
+from foodgram.metrics import COUNT_BUCKETS, REGISTRY
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса.',
+)
+REQUEST_QUERIES = REGISTRY.histogram(
+    'foodgram_request_queries',
+    'Количество SQL-запросов на один HTTP-запрос.',
+    COUNT_BUCKETS,
+)
+DB_DURATION = REGISTRY.counter(
+    'foodgram_db_duration_seconds_total',
+    'Суммарное время выполнения SQL-запросов.',
+)
+DUPLICATE_QUERIES = REGISTRY.counter(
+    'foodgram_db_duplicate_queries_total',
+    'Повторы одного и того же SQL в рамках запроса (признак N+1).',
+)
@@ -0,0 +1,99 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import (DB_DURATION, DUPLICATE_QUERIES, REQUEST_LATENCY,
+                      REQUEST_QUERIES)
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """Обёртка над execute: считает запросы, их время и повторы."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        return {
+            sql: count for sql, count in self.statements.items() if count > 1
+        }
+
+
+def get_view_name(request):
+    """Имя представления вида RecipeViewSet.list для меток метрик."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view = match.func
+    view_class = getattr(view, 'cls', None)
+    if view_class is None:
+        return match.view_name or view.__name__
+    action = getattr(view, 'actions', {}).get(request.method.lower())
+    if action:
+        return f'{view_class.__name__}.{action}'
+    return view_class.__name__
+
+
+class InstrumentationMiddleware:
+    """Задержка, число и время SQL-запросов по каждому представлению."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        view = get_view_name(request)
+        duplicates = recorder.duplicates
+        REQUEST_LATENCY.observe(
+            duration, view=view, method=request.method,
+            status=response.status_code,
+        )
+        REQUEST_QUERIES.observe(recorder.count, view=view)
+        DB_DURATION.inc(recorder.duration, view=view)
+        if duplicates:
+            DUPLICATE_QUERIES.inc(
+                sum(count - 1 for count in duplicates.values()), view=view
+            )
+        if duration * 1000 >= settings.SLOW_REQUEST_MS:
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 2),
+                'queries': recorder.count,
+                'db_ms': round(recorder.duration * 1000, 2),
+                'duplicates': [
+                    {'sql': sql[:200], 'count': count}
+                    for sql, count in sorted(
+                        duplicates.items(), key=lambda item: -item[1]
+                    )[:5]
+                ],
+            }, ensure_ascii=False))
+        return response
@@ -1,8 +1,12 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
 from rest_framework.mixins import CreateModelMixin, DestroyModelMixin
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import SAFE_METHODS, AllowAny
 from rest_framework.viewsets import GenericViewSet, ReadOnlyModelViewSet
 
+from foodgram.cache import is_cache_shared
+from foodgram.db.router import choose_replica, read_replica
 from recipes.models import Recipe
 
 
@@ -25,7 +29,60 @@ class ShoppingFavoriteMixin(CreateModelMixin,
         )
 
 
-class TagsIngredientMixin(ReadOnlyModelViewSet):
+class ReplicaReadMixin:
+    """Безопасные запросы читают данные из реплики, одной на запрос.
+
+    Решение принимается после аутентификации: пользователь, который
+    недавно что-то изменил, читает из default и видит свои изменения,
+    даже если реплика отстаёт. Отметка о записи хранится в подписанной
+    cookie, которую видит любой воркер, а с общим кэшем — ещё и в кэше
+    для клиентов без cookie.
+    """
+    sticky_cookie = 'replica_sticky'
+
+    def sticky_key(self, user):
+        return f'replica-sticky:{user.pk}'
+
+    def is_sticky(self, request):
+        if not request.user.is_authenticated:
+            return False
+        value = request.get_signed_cookie(
+            self.sticky_cookie, default=None, salt=self.sticky_cookie,
+            max_age=settings.REPLICA_STICKY_SECONDS,
+        )
+        if value == str(request.user.pk):
+            return True
+        return is_cache_shared() and bool(
+            cache.get(self.sticky_key(request.user))
+        )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not self.is_sticky(request):
+            self.replica_token = read_replica.set(choose_replica())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, 'replica_token', None)
+        if token is not None:
+            read_replica.reset(token)
+            self.replica_token = None
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if (request.method not in SAFE_METHODS
+                and request.user.is_authenticated):
+            response.set_signed_cookie(
+                self.sticky_cookie, request.user.pk, salt=self.sticky_cookie,
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True,
+                samesite='Lax',
+            )
+            if is_cache_shared():
+                cache.set(self.sticky_key(request.user), True,
+                          settings.REPLICA_STICKY_SECONDS)
+        return response
+
+
+class TagsIngredientMixin(ReplicaReadMixin, ReadOnlyModelViewSet):
     """Миксин для тегов и ингредиентов."""
     permission_classes = (AllowAny,)
     pagination_class = None
@@ -0,0 +1,49 @@
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .events import format_event
+
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON-рендерер на orjson, без него работает как JSONRenderer.
+
+    Вывод совпадает с JSONRenderer: даты и прочие нестандартные типы
+    кодируются его энкодером, форматированный вывод (indent) отдаётся
+    стандартной реализации.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+        if LINE_SEPARATOR in ret or PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(LINE_SEPARATOR, b'\\u2028').replace(
+                PARAGRAPH_SEPARATOR, b'\\u2029'
+            )
+        return ret
+
+
+class EventStreamRenderer(BaseRenderer):
+    """text/event-stream для потока событий.
+
+    Сам поток отдаётся StreamingHttpResponse, рендерер нужен для
+    согласования формата и для ответов с ошибками.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_event('error', data).encode()
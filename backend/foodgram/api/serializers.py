@@ -5,11 +5,13 @@ from django.shortcuts import get_object_or_404
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
                             Shoppingcart, Subscription, Tag)
-from rest_framework.serializers import (CharField, IntegerField,
-                                        ModelSerializer, ReadOnlyField,
-                                        SerializerMethodField, ValidationError)
+from rest_framework.serializers import (BaseSerializer, CharField,
+                                        IntegerField, ModelSerializer,
+                                        ReadOnlyField, SerializerMethodField,
+                                        ValidationError)
 from rest_framework.validators import UniqueTogetherValidator
 
+from jobs.queue import enqueue
 from users.models import User
 from .utils import Base64ImageField
 
@@ -81,13 +83,6 @@ class TagsSerializer(ModelSerializer):
         fields = '__all__'
 
 
-class IngredientSerializer(ModelSerializer):
-    """Сериализатор для модели ингредиента, метод GET."""
-    class Meta:
-        model = Ingredient
-        fields = '__all__'
-
-
 class IngredientGetSerializer(ModelSerializer):
     """Получение информации об ингредиенте, метод GET."""
     id = ReadOnlyField(
@@ -120,6 +115,63 @@ class RecipeIngredientsSerializer(ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class TagsReadSerializer(BaseSerializer):
+    """Облегчённый сериализатор тегов для списков, без полей DRF."""
+    def to_representation(self, tag):
+        return {
+            'id': tag.id,
+            'name': tag.name,
+            'color': tag.color,
+            'slug': tag.slug,
+        }
+
+
+class IngredientReadSerializer(BaseSerializer):
+    """Облегчённый сериализатор ингредиентов для списков."""
+    def to_representation(self, ingredient):
+        return {
+            'id': ingredient.id,
+            'name': ingredient.name,
+            'measurement_unit': ingredient.measurement_unit,
+        }
+
+
+class RecipeCacheSerializer(BaseSerializer):
+    """Общая для всех пользователей часть рецепта, хранится в кэше.
+
+    Словарь собирается напрямую, без полей DRF, в том же виде,
+    что и у RecipeGetSerializer. Картинка отдаётся относительным путём.
+    """
+    def to_representation(self, recipe):
+        author = recipe.author
+        return {
+            'id': recipe.id,
+            'author': {
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+                'id': author.id,
+                'username': author.username,
+                'email': author.email,
+            },
+            'tags': TagsReadSerializer(recipe.tags.all(), many=True).data,
+            'ingredients': [
+                {
+                    'id': item.ingredient.id,
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                    'recipe': item.recipe_id,
+                    'ingredient': item.ingredient_id,
+                }
+                for item in recipe.recipeingredients.all()
+            ],
+            'image': recipe.image.url if recipe.image else None,
+            'name': recipe.name,
+            'cooking_time': recipe.cooking_time,
+            'text': recipe.text,
+        }
+
+
 class RecipeGetSerializer(ModelSerializer):
     """Получение информации о рецепте с ингредиентами, метод GET."""
     author = UserGetSerializer(read_only=True)
@@ -138,7 +190,9 @@ class RecipeGetSerializer(ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = '__all__'
+        fields = ('id', 'author', 'tags', 'ingredients', 'is_favorited',
+                  'is_in_shopping_cart', 'image', 'name', 'cooking_time',
+                  'text')
 
     def get_is_favorited(self, obj):
         """Определяем, добавлен ли данный рецепт в избранное."""
@@ -198,6 +252,7 @@ class RecipePostSerializer(ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
+        enqueue('warm_recipe_cache', recipe_id=recipe.id)
         return recipe
 
     @transaction.atomic
@@ -208,8 +263,10 @@ class RecipePostSerializer(ModelSerializer):
         instance.tags.set(tags)
         RecipeIngredients.objects.filter(recipe=instance).delete()
         self.create_ingredients(ingredients, instance)
-        instance.save()
+        # Сохранение в super().update() обновляет updated_at один раз
+        # после замены тегов и ингредиентов.
         super().update(instance, validated_data)
+        enqueue('warm_recipe_cache', recipe_id=instance.id)
         return instance
 
 
@@ -253,14 +310,3 @@ class ShoppingCartSerializer(ModelSerializer):
             instance.recipe,
             context={'request': request}
         ).data
-
-
-class UserSubscriptionsGetSerializer(UserGetSerializer):
-    recipes = RecipeGetSerializer(read_only=True, many=True)
-    recipes_count = ReadOnlyField(
-        source='recipes.count',
-        read_only=True
-    )
-
-    class Meta(UserGetSerializer.Meta):
-        fields = UserGetSerializer.Meta.fields + ('recipes', 'recipes_count')
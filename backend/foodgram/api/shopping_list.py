@@ -0,0 +1,119 @@
+"""Формирование списка покупок пользователя.
+
+Файл списка рендерится фоновой задачей после каждого изменения корзины
+и ищется в кэше по состоянию корзины. Если готового файла нет
+(задача ещё не выполнена или кэш не общий), список строится сразу.
+
+Если пользователь поделился списком, та же задача обновляет публичную
+копию в MEDIA_ROOT/shared/<token>.txt, которую nginx отдаёт по
+SHARED_LIST_URL без обращения к бэкенду.
+"""
+import hashlib
+import os
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+
+from recipes.models import (RecipeIngredients, SharedShoppingList,
+                            Shoppingcart)
+from .units import consolidate
+from .utils import write_file, write_protected_file
+
+SHOPPING_LIST_DIR = 'shopping_lists'
+SHARED_LIST_DIR = 'shared'
+
+
+def get_shopping_list_rows(user_id):
+    return RecipeIngredients.objects.filter(
+        recipe__shoppingrecipe__user=user_id
+    ).values(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(ingredient_amount=Sum('amount'))
+
+
+def render_shopping_list(rows):
+    shopping_list = ['Список покупок:\n']
+    for name, amount, unit in consolidate(
+        (row['ingredient__name'], row['ingredient__measurement_unit'],
+         row['ingredient_amount'])
+        for row in rows
+    ):
+        shopping_list.append(f'\n{name} - {amount}, {unit}')
+    return ''.join(shopping_list)
+
+
+def get_cart_state(user_id):
+    """Строка, меняющаяся при изменении корзины или рецептов в ней.
+
+    Строится только по базе, поэтому одинакова во всех процессах и
+    после перезапуска. Строки корзины добавляются с растущим id:
+    при том же максимальном id корзина могла только уменьшиться, и
+    число строк однозначно задаёт её состав.
+    """
+    state = Shoppingcart.objects.filter(user=user_id).aggregate(
+        count=Count('id'), last=Max('id'), updated=Max('recipe__updated_at')
+    )
+    updated = state['updated']
+    return '{}:{}:{}'.format(
+        state['count'], state['last'] or 0,
+        updated.timestamp() if updated else 0,
+    )
+
+
+def save_shopping_list(user_id, state):
+    """Сохраняет список покупок в защищённый каталог и возвращает путь.
+
+    Имя файла — хеш содержимого, поэтому одинаковый список
+    не перезаписывается.
+    """
+    content = render_shopping_list(get_shopping_list_rows(user_id)).encode()
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    path = write_protected_file(
+        f'{SHOPPING_LIST_DIR}/{user_id}/{digest}.txt', content
+    )
+    token = SharedShoppingList.objects.filter(user=user_id).values_list(
+        'token', flat=True
+    ).first()
+    if token is not None:
+        write_file(shared_list_path(token), content)
+    cache.set(f'shopping-list:{user_id}:{state}', path,
+              settings.RECIPE_CACHE_TIMEOUT)
+    return path
+
+
+def get_shopping_list(user_id):
+    """Путь к актуальному файлу списка покупок."""
+    state = get_cart_state(user_id)
+    path = cache.get(f'shopping-list:{user_id}:{state}')
+    if path is None or not os.path.exists(
+        os.path.join(settings.PROTECTED_MEDIA_ROOT, path)
+    ):
+        path = save_shopping_list(user_id, state)
+    return path
+
+
+def shared_list_path(token):
+    return os.path.join(settings.MEDIA_ROOT, SHARED_LIST_DIR, f'{token}.txt')
+
+
+def share_shopping_list(user_id):
+    """Создаёт публичную копию списка покупок, если её ещё нет.
+
+    Возвращает запись SharedShoppingList и признак создания.
+    """
+    shared, created = SharedShoppingList.objects.get_or_create(
+        user_id=user_id, defaults={'token': secrets.token_urlsafe(9)}
+    )
+    if created or not os.path.exists(shared_list_path(shared.token)):
+        # Запись уже есть, поэтому save_shopping_list пишет и копию.
+        save_shopping_list(user_id, get_cart_state(user_id))
+    return shared, created
+
+
+def delete_shared_list_file(token):
+    try:
+        os.remove(shared_list_path(token))
+    except FileNotFoundError:
+        pass
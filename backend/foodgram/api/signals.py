@@ -0,0 +1,85 @@
+"""Реакция API на изменение данных пользователей."""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from jobs.queue import enqueue
+from recipes.models import (Ingredient, Recipe, SharedShoppingList,
+                            Shoppingcart)
+from recipes.signals import SERVICE_USER_FIELDS, user_recipes_deleted
+from .authentication import invalidate_token
+from .ingredient_index import mark_recipe_changed
+from .shopping_list import delete_shared_list_file, get_cart_state
+
+
+def render_shopping_list_later(user_id):
+    # Состояние считается после коммита, когда удаление уже видно.
+    transaction.on_commit(lambda: enqueue(
+        'render_shopping_list',
+        idempotency_key=f'shopping-list:{user_id}:{get_cart_state(user_id)}',
+        user_id=user_id,
+    ))
+
+
+@receiver(post_save, sender=Shoppingcart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    render_shopping_list_later(instance.user_id)
+
+
+# Корзины удалённого рецепта сигнала не получают: список строится
+# заново при скачивании, потому что состояние корзины изменилось.
+@receiver(user_recipes_deleted, sender=Shoppingcart)
+def shopping_cart_items_deleted(sender, rows, **kwargs):
+    for user_id in {user_id for user_id, _ in rows}:
+        render_shopping_list_later(user_id)
+
+
+# Срабатывает и при отзыве ссылки, и при удалении пользователя.
+@receiver(post_delete, sender=SharedShoppingList)
+def shared_list_deleted(sender, instance, **kwargs):
+    token = instance.token
+    transaction.on_commit(lambda: delete_shared_list_file(token))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, created, update_fields, **kwargs):
+    if created or (update_fields and set(update_fields)
+                   <= SERVICE_USER_FIELDS):
+        return
+    for key in Token.objects.filter(user=instance).values_list(
+        'key', flat=True
+    ):
+        invalidate_token(key)
+
+
+# Ингредиенты меняются только вместе с сохранением рецепта (сериализатор,
+# админка), поэтому обработчика на строки RecipeIngredients нет, и
+# удаление рецепта остаётся быстрым каскадом. Ингредиенты создаются
+# bulk_create после сохранения рецепта, и в индекс изменение попадает
+# после фиксации транзакции.
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_composition_changed(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: mark_recipe_changed(recipe_id))
+
+
+# Удаление ингредиента меняет состав рецептов каскадом, без сохранения
+# самих рецептов.
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    recipe_ids = list(Recipe.objects.filter(
+        ingredients=instance
+    ).values_list('pk', flat=True))
+
+    def mark_recipes_changed():
+        for recipe_id in recipe_ids:
+            mark_recipe_changed(recipe_id)
+
+    transaction.on_commit(mark_recipes_changed)
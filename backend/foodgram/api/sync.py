@@ -0,0 +1,169 @@
+"""Дельта-синхронизация для мобильных клиентов.
+
+Клиент хранит sync_token из последнего ответа и передаёт его в
+?since=. В ответ приходят строки, изменённые после токена, и id
+удалённых строк из журнала Tombstone. Без since или с токеном старше
+SYNC_TOMBSTONE_TTL, когда журнал уже очищен, отдаётся полный набор
+с full: true, и клиент заменяет им локальные данные.
+
+Строки читаются страницами по индексу (время изменения, id), записи
+журнала удалений — так же по (время удаления, id), до limit тех и
+других за запрос. has_more означает, что нужно повторить запрос
+с новым токеном; full: true бывает только на первой странице полного
+набора. Токен хранит позиции последней строки и последней записи
+журнала. Когда строки или удаления закончились, позиция ставится на
+SYNC_OVERLAP_SECONDS раньше начала запроса: время ставится при
+save(), а видна строка становится после коммита, и без перекрытия её
+можно пропустить. Повторно присланные строки и удаления клиент
+просто применяет ещё раз.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from recipes.models import (Favorite, Ingredient, Recipe, Shoppingcart, Tag,
+                            Tombstone)
+from .cache import represent_recipes
+from .serializers import IngredientReadSerializer, TagsReadSerializer
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+# queryset(request) — строки ресурса, field — поле времени изменения,
+# key — поле, которое попадает в deleted, represent(rows, request).
+SyncResource = namedtuple(
+    'SyncResource', ('model', 'queryset', 'field', 'key', 'represent')
+)
+
+
+def user_recipe_ids(rows, request):
+    return [row.recipe_id for row in rows]
+
+
+RESOURCES = {
+    'tags': SyncResource(
+        Tag, lambda request: Tag.objects.all(), 'updated_at', 'pk',
+        lambda rows, request: TagsReadSerializer(rows, many=True).data,
+    ),
+    'ingredients': SyncResource(
+        Ingredient, lambda request: Ingredient.objects.all(), 'updated_at',
+        'pk',
+        lambda rows, request: IngredientReadSerializer(rows, many=True).data,
+    ),
+    'recipes': SyncResource(
+        Recipe, lambda request: Recipe.objects.all(), 'updated_at', 'pk',
+        represent_recipes,
+    ),
+    'favorites': SyncResource(
+        Favorite, lambda request: Favorite.objects.filter(user=request.user),
+        'created_at', 'recipe_id', user_recipe_ids,
+    ),
+    'shopping_cart': SyncResource(
+        Shoppingcart,
+        lambda request: Shoppingcart.objects.filter(user=request.user),
+        'created_at', 'recipe_id', user_recipe_ids,
+    ),
+}
+
+
+def encode_token(moment, pk, deleted_since, deleted_pk):
+    return '.'.join(str(value) for value in (
+        (moment - EPOCH) // MICROSECOND, pk,
+        (deleted_since - EPOCH) // MICROSECOND, deleted_pk,
+    ))
+
+
+def decode_token(token):
+    """Позиции (время, id) последней строки и последнего удаления."""
+    try:
+        moment, pk, deleted_since, deleted_pk = map(int, token.split('.'))
+        return (EPOCH + moment * MICROSECOND, pk,
+                EPOCH + deleted_since * MICROSECOND, deleted_pk)
+    except (ValueError, OverflowError):
+        raise ValidationError({'since': 'Некорректный токен синхронизации.'})
+
+
+def page_size(request):
+    try:
+        limit = int(request.query_params.get(
+            'limit', settings.SYNC_PAGE_SIZE
+        ))
+    except ValueError:
+        raise ValidationError({'limit': 'Ожидается целое число.'})
+    return max(1, min(limit, settings.SYNC_PAGE_SIZE))
+
+
+def after(queryset, field, moment, pk):
+    """Строки после позиции (moment, pk) в порядке (field, id).
+
+    Условие >= с исключением, а не OR: так индекс (время, id) читается
+    с позиции токена, а не целиком.
+    """
+    return queryset.filter(**{f'{field}__gte': moment}).exclude(
+        **{field: moment, 'pk__lte': pk}
+    ).order_by(field, 'pk')
+
+
+def deleted_page(resource, request, since, last_pk, limit, queryset):
+    """Ключи удалённых строк, кроме добавленных снова.
+
+    Возвращает ключи и позицию последней прочитанной записи журнала
+    или None, если записей больше нет.
+    """
+    owner = request.user.pk if resource.key == 'recipe_id' else None
+    tombstones = list(after(
+        Tombstone.objects.filter(
+            model=resource.model._meta.model_name, owner=owner
+        ),
+        'deleted_at', since, last_pk,
+    ).values_list('deleted_at', 'pk', 'object_id')[:limit + 1])
+    position = tombstones[limit - 1][:2] if len(tombstones) > limit else None
+    deleted = {object_id for *_, object_id in tombstones[:limit]}
+    if deleted:
+        deleted -= set(queryset.filter(
+            **{f'{resource.key}__in': deleted}
+        ).values_list(resource.key, flat=True))
+    return sorted(deleted), position
+
+
+def sync(name, request):
+    """Страница изменений ресурса name после токена ?since=."""
+    resource = RESOURCES[name]
+    started = timezone.now()
+    horizon = started - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+    limit = page_size(request)
+    queryset = resource.queryset(request)
+    full = True
+    since = request.query_params.get('since')
+    if since is not None:
+        moment, last_pk, deleted_since, deleted_pk = decode_token(since)
+        full = deleted_since < started - timedelta(
+            seconds=settings.SYNC_TOMBSTONE_TTL
+        )
+    if full:
+        # Удаления во время постраничной загрузки полного набора
+        # отдаются на следующих страницах.
+        changed = queryset.order_by(resource.field, 'pk')
+        deleted, deleted_position = [], None
+    else:
+        changed = after(queryset, resource.field, moment, last_pk)
+        deleted, deleted_position = deleted_page(
+            resource, request, deleted_since, deleted_pk, limit, queryset
+        )
+    rows = list(changed[:limit + 1])
+    rows_left = len(rows) > limit
+    rows = rows[:limit]
+    position = ((getattr(rows[-1], resource.field), rows[-1].pk)
+                if rows_left else (horizon, 0))
+    has_more = rows_left or deleted_position is not None
+    token = encode_token(*position, *(deleted_position or (horizon, 0)))
+    return {
+        'full': full,
+        'changed': resource.represent(rows, request),
+        'deleted': deleted,
+        'has_more': has_more,
+        'sync_token': token,
+    }
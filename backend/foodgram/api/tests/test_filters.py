@@ -0,0 +1,223 @@
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from api.filters import RecipeFilter
+from api.management.commands.benchmark_api import plan_problems
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            Shoppingcart, Tag)
+from recipes.signals import delete_user_recipes
+from users.models import User
+
+
+class RecipeFilterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='secret'
+        )
+        cls.other = User.objects.create_user(
+            username='chef', email='chef@example.com', password='secret'
+        )
+        cls.flour, cls.egg, cls.milk = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'яйцо', 'молоко')
+        )
+        cls.breakfast = Tag.objects.create(name='Завтрак', slug='breakfast',
+                                           color='#000001')
+        cls.lunch = Tag.objects.create(name='Обед', slug='lunch',
+                                       color='#000002')
+        cls.pancakes = cls.create_recipe(
+            'блины', 20, (cls.flour, cls.egg, cls.milk), (cls.breakfast,)
+        )
+        cls.omelette = cls.create_recipe(
+            'омлет', 10, (cls.egg, cls.milk), (cls.breakfast, cls.lunch)
+        )
+        cls.bread = cls.create_recipe('хлеб', 180, (cls.flour,), (cls.lunch,))
+        for user in (cls.user, cls.other):
+            Favorite.objects.create(user=user, recipe=cls.omelette)
+        Favorite.objects.create(user=cls.user, recipe=cls.bread)
+        Shoppingcart.objects.create(user=cls.user, recipe=cls.pancakes)
+
+    @classmethod
+    def create_recipe(cls, name, cooking_time, ingredients, tags):
+        recipe = Recipe.objects.create(
+            author=cls.user, name=name, text=name, cooking_time=cooking_time,
+            image=f'recipes/images/{name}.png',
+        )
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        )
+        recipe.tags.set(tags)
+        return recipe
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_ids(self, params, user=None):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/recipes/',
+                                   {**params, 'limit': 100})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def assertFilters(self, params, recipes, user=None, ordered=False):
+        ids = self.get_ids(params, user)
+        expected = [recipe.id for recipe in recipes]
+        if not ordered:
+            ids, expected = sorted(ids), sorted(expected)
+        self.assertEqual(ids, expected)
+
+    def test_cooking_time_range(self):
+        self.assertFilters({'min_cooking_time': 15},
+                           [self.pancakes, self.bread])
+        self.assertFilters({'max_cooking_time': 20},
+                           [self.pancakes, self.omelette])
+        self.assertFilters({'min_cooking_time': 15, 'max_cooking_time': 20},
+                           [self.pancakes])
+
+    def test_ingredients_require_all(self):
+        self.assertFilters({'ingredients': self.egg.id},
+                           [self.pancakes, self.omelette])
+        self.assertFilters(
+            {'ingredients': f'{self.flour.id},{self.egg.id}'},
+            [self.pancakes],
+        )
+        self.assertFilters(
+            {'ingredients': f'{self.egg.id},{self.egg.id}'},
+            [self.pancakes, self.omelette],
+        )
+
+    def test_exclude_ingredients_excludes_any(self):
+        self.assertFilters({'exclude_ingredients': self.milk.id},
+                           [self.bread])
+        self.assertFilters(
+            {'exclude_ingredients': f'{self.flour.id},{self.milk.id}'}, []
+        )
+
+    def test_tags_match_any_without_duplicates(self):
+        self.assertFilters({'tags': ['breakfast', 'lunch']},
+                           [self.pancakes, self.omelette, self.bread],
+                           ordered=False)
+        ids = self.get_ids({'tags': ['breakfast', 'lunch']})
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_user_flags(self):
+        self.assertFilters({'is_favorited': 1},
+                           [self.omelette, self.bread], self.user)
+        self.assertFilters({'is_in_shopping_cart': 1},
+                           [self.pancakes], self.user)
+        self.assertFilters({'is_favorited': 0},
+                           [self.pancakes, self.omelette, self.bread],
+                           self.user)
+        # Анонимный пользователь получает все рецепты.
+        self.assertFilters({'is_favorited': 1},
+                           [self.pancakes, self.omelette, self.bread])
+
+    def test_ordering(self):
+        self.assertFilters({'ordering': 'cooking_time'},
+                           [self.omelette, self.pancakes, self.bread],
+                           ordered=True)
+        self.assertFilters({'ordering': '-popularity'},
+                           [self.omelette, self.bread, self.pancakes],
+                           ordered=True)
+        self.assertFilters({'ordering': 'popularity'},
+                           [self.pancakes, self.bread, self.omelette],
+                           ordered=True)
+
+    def test_favorites_count_follows_favorites(self):
+        self.omelette.refresh_from_db()
+        self.assertEqual(self.omelette.favorites_count, 2)
+        Favorite.objects.create(user=self.other, recipe=self.pancakes)
+        delete_user_recipes(Favorite.objects.filter(recipe=self.omelette))
+        self.assertFilters({'ordering': '-popularity'},
+                           [self.bread, self.pancakes, self.omelette],
+                           ordered=True)
+
+    def test_combined(self):
+        self.assertFilters(
+            {'tags': 'breakfast', 'ingredients': self.milk.id,
+             'max_cooking_time': 60, 'is_favorited': 1},
+            [self.omelette], self.user,
+        )
+
+    def test_invalid_ordering(self):
+        response = self.client.get('/api/recipes/', {'ordering': 'name'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RecipeFilterQueryTests(TestCase):
+    """Планы и число запросов на сгенерированных данных."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_data', users=20, recipes=200, favorites=10,
+                     carts=5, subscriptions=0, workers=1, verbosity=0)
+        cls.user = User.objects.first()
+        cls.tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        cls.ingredients = list(RecipeIngredients.objects.values_list(
+            'ingredient_id', flat=True
+        )[:3])
+
+    def setUp(self):
+        cache.clear()
+
+    def scenarios(self):
+        include = ','.join(map(str, self.ingredients[:2]))
+        return {
+            'cooking_time': {'min_cooking_time': 10, 'max_cooking_time': 30},
+            'ingredients': {'ingredients': include},
+            'exclude_ingredients': {
+                'exclude_ingredients': self.ingredients[2]
+            },
+            'flags': {'is_favorited': 1, 'is_in_shopping_cart': 1,
+                      'tags': self.tags},
+            'ordering': {'ordering': '-popularity'},
+            'combined': {'tags': self.tags, 'ingredients': include,
+                         'max_cooking_time': 120, 'is_favorited': 1,
+                         'ordering': '-popularity'},
+        }
+
+    def test_plans_use_indexes(self):
+        request = Request(RequestFactory().get('/'))
+        request.user = self.user
+        for name, params in self.scenarios().items():
+            with self.subTest(name):
+                queryset = RecipeFilter(
+                    QueryDict(urlencode(params, doseq=True)),
+                    queryset=Recipe.objects.all(),
+                    request=request,
+                ).qs
+                sql = str(queryset[:6].query)
+                self.assertNotIn('JOIN', sql)
+                self.assertNotIn('DISTINCT', sql)
+                problems = plan_problems(queryset[:6].explain(),
+                                         connection.vendor)
+                self.assertEqual(problems['full_scans'], [])
+                if name == 'ordering':
+                    self.assertEqual(problems['sorts'], 0)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for name, params in self.scenarios().items():
+            counts = []
+            for limit in (2, 6):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get('/api/recipes/',
+                                          {**params, 'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                counts.append(len(queries))
+            with self.subTest(name):
+                self.assertEqual(counts[0], counts[1])
@@ -0,0 +1,39 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from api.ingredient_index import IngredientIndex
+from recipes.models import Ingredient, Recipe, RecipeIngredients
+from users.models import User
+
+
+class IngredientDeletedTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='secret'
+        )
+        self.salt, self.egg = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'яйцо')
+        )
+        self.recipe = Recipe.objects.create(
+            author=user, name='омлет', text='жарить', cooking_time=10,
+            image='recipes/images/omelette.png',
+        )
+        for ingredient in (self.salt, self.egg):
+            RecipeIngredients.objects.create(
+                recipe=self.recipe, ingredient=ingredient, amount=1
+            )
+
+    def test_recipe_is_touched_and_reindexed(self):
+        index = IngredientIndex()
+        index.rebuild()
+        self.assertEqual(index.search([self.salt.id]),
+                         [(self.recipe.id, 1, 2)])
+        updated_at = Recipe.objects.get().updated_at
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salt.delete()
+        self.assertGreater(Recipe.objects.get().updated_at, updated_at)
+        self.assertEqual(index.search([self.egg.id]),
+                         [(self.recipe.id, 1, 1)])
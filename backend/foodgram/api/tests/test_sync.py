@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.sync import encode_token
+from recipes.models import Favorite, Ingredient, Recipe
+from recipes.signals import delete_user_recipes
+from users.models import User
+
+
+@override_settings(SYNC_OVERLAP_SECONDS=0, SYNC_PAGE_SIZE=100)
+class SyncTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {number}',
+                                      measurement_unit='г')
+            for number in range(7)
+        ]
+
+    def sync(self, resource, since=None, limit=3):
+        params = {'limit': limit}
+        if since is not None:
+            params['since'] = since
+        response = self.client.get(f'/api/sync/{resource}/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def sync_all(self, resource, since=None, limit=3):
+        """Все страницы подряд, начиная с токена since."""
+        pages = []
+        while True:
+            page = self.sync(resource, since, limit)
+            pages.append(page)
+            since = page['sync_token']
+            if not page['has_more']:
+                return pages, since
+
+    def test_full_sync_pages_cover_all_rows_once(self):
+        pages, _ = self.sync_all('ingredients')
+        self.assertEqual([len(page['changed']) for page in pages],
+                         [3, 3, 1])
+        self.assertEqual([page['full'] for page in pages],
+                         [True, False, False])
+        ids = [row['id'] for page in pages for row in page['changed']]
+        self.assertEqual(sorted(ids),
+                         sorted(item.pk for item in self.ingredients))
+
+    def test_only_changes_after_token(self):
+        _, token = self.sync_all('ingredients')
+        changed = self.ingredients[2]
+        changed.name = 'соль'
+        changed.save()
+        page = self.sync('ingredients', token)
+        self.assertFalse(page['full'])
+        self.assertEqual([row['id'] for row in page['changed']],
+                         [changed.pk])
+        self.assertEqual(page['deleted'], [])
+
+    def test_deletions_are_paged(self):
+        _, token = self.sync_all('ingredients')
+        deleted = [item.pk for item in self.ingredients[:5]]
+        Ingredient.objects.filter(pk__in=deleted).delete()
+        pages, _ = self.sync_all('ingredients', token, limit=2)
+        self.assertEqual([len(page['deleted']) for page in pages],
+                         [2, 2, 1])
+        self.assertEqual(
+            sorted(pk for page in pages for pk in page['deleted']), deleted
+        )
+        self.assertTrue(all(not page['changed'] for page in pages))
+
+    def test_readded_rows_are_not_deleted(self):
+        user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='secret'
+        )
+        recipe = Recipe.objects.create(
+            author=user, name='суп', text='варить', cooking_time=10,
+            image='recipes/images/soup.png',
+        )
+        self.client.force_authenticate(user)
+        Favorite.objects.create(user=user, recipe=recipe)
+        _, token = self.sync_all('favorites')
+        delete_user_recipes(Favorite.objects.filter(user=user))
+        Favorite.objects.create(user=user, recipe=recipe)
+        page = self.sync('favorites', token)
+        self.assertEqual(page['deleted'], [])
+        self.assertEqual(page['changed'], [recipe.pk])
+
+    def test_expired_token_gets_full_sync(self):
+        old = timezone.now() - timedelta(days=365)
+        page = self.sync('ingredients', encode_token(old, 0, old, 0))
+        self.assertTrue(page['full'])
+        self.assertEqual(page['deleted'], [])
+
+    def test_invalid_token(self):
+        response = self.client.get('/api/sync/ingredients/',
+                                   {'since': 'garbage'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,45 @@
+from unittest import mock
+
+from django.test import RequestFactory, TestCase
+from rest_framework.throttling import SimpleRateThrottle
+
+from api.throttling import SlidingWindowThrottle, WriteThrottle
+from users.models import User
+
+RATES = {'write_user': '3/min', 'write_ip': '2/min'}
+
+
+@mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', RATES)
+class WriteThrottleTests(TestCase):
+
+    def setUp(self):
+        SlidingWindowThrottle.cache.clear()
+        self.addCleanup(SlidingWindowThrottle.cache.clear)
+        self.first, self.second = (
+            User.objects.create_user(username=name, email=f'{name}@ex.com',
+                                     password='secret')
+            for name in ('first', 'second')
+        )
+
+    def allow(self, user, address):
+        request = RequestFactory().post('/', REMOTE_ADDR=address)
+        request.user = user
+        return WriteThrottle().allow_request(request, None)
+
+    def test_ip_rejection_does_not_use_user_quota(self):
+        self.assertTrue(self.allow(self.first, '10.0.0.1'))
+        self.assertTrue(self.allow(self.second, '10.0.0.1'))
+        # Лимит IP исчерпан: запросы отклоняются и не засчитываются
+        # пользователю.
+        for _ in range(5):
+            self.assertFalse(self.allow(self.first, '10.0.0.1'))
+        self.assertTrue(self.allow(self.first, '10.0.0.2'))
+        self.assertTrue(self.allow(self.first, '10.0.0.3'))
+        self.assertFalse(self.allow(self.first, '10.0.0.4'))
+
+    def test_user_rejection_does_not_use_ip_quota(self):
+        for address in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            self.assertTrue(self.allow(self.first, address))
+        self.assertFalse(self.allow(self.first, '10.0.0.4'))
+        self.assertTrue(self.allow(self.second, '10.0.0.4'))
+        self.assertTrue(self.allow(self.second, '10.0.0.4'))
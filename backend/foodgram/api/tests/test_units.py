@@ -0,0 +1,81 @@
+from fractions import Fraction
+
+from django.test import SimpleTestCase
+
+from api.units import (UNIT_CONVERSIONS, UNITS, build_unit_table,
+                       consolidate, format_amount)
+
+
+class BuildUnitTableTests(SimpleTestCase):
+
+    def test_units_point_to_base_unit(self):
+        self.assertEqual(UNITS['г'], ('г', Fraction(1)))
+        self.assertEqual(UNITS['кг'], ('г', Fraction(1000)))
+        self.assertEqual(UNITS['ст. л.'], ('мл', Fraction(15)))
+        self.assertEqual(UNITS['капля'], ('мл', Fraction(1, 20)))
+
+    def test_every_conversion_is_in_table(self):
+        for unit, base, factor in UNIT_CONVERSIONS:
+            with self.subTest(unit=unit):
+                self.assertEqual(UNITS[unit][1], Fraction(factor))
+
+    def test_chained_conversions_are_exact(self):
+        table = build_unit_table((
+            ('ведро', 'л', '10'),
+            ('л', 'мл', '1000'),
+            ('ч. л.', 'мл', '5'),
+        ))
+        self.assertEqual(table['ведро'], ('мл', Fraction(10000)))
+        self.assertEqual(table['л'], ('мл', Fraction(1000)))
+        self.assertEqual(table['ч. л.'], ('мл', Fraction(5)))
+
+    def test_unknown_units_are_not_converted(self):
+        self.assertNotIn('шт.', UNITS)
+        self.assertNotIn('по вкусу', UNITS)
+
+
+class FormatAmountTests(SimpleTestCase):
+
+    def test_format(self):
+        self.assertEqual(format_amount(Fraction(3)), '3')
+        self.assertEqual(format_amount(Fraction(3, 2)), '1.5')
+        self.assertEqual(format_amount(Fraction(1, 3)), '0.33')
+        self.assertEqual(format_amount(Fraction(1500)), '1500')
+
+
+class ConsolidateTests(SimpleTestCase):
+
+    def test_single_unit_is_kept(self):
+        self.assertEqual(
+            consolidate([('соль', 'ч. л.', 2), ('мука', 'г', 300)]),
+            [('соль', '2', 'ч. л.'), ('мука', '300', 'г')],
+        )
+
+    def test_compatible_units_are_summed_in_base_unit(self):
+        self.assertEqual(
+            consolidate([('молоко', 'ст. л.', 2), ('молоко', 'ч. л.', 3)]),
+            [('молоко', '45', 'мл')],
+        )
+
+    def test_large_sum_uses_display_unit(self):
+        self.assertEqual(
+            consolidate([('мука', 'г', 500), ('мука', 'кг', 1)]),
+            [('мука', '1.5', 'кг')],
+        )
+        self.assertEqual(
+            consolidate([('вода', 'стакан', 2), ('вода', 'л', 1)]),
+            [('вода', '1.5', 'л')],
+        )
+
+    def test_incompatible_units_stay_separate(self):
+        self.assertEqual(
+            consolidate([('яйцо', 'шт.', 2), ('яйцо', 'г', 50),
+                         ('яйцо', 'мл', 30)]),
+            [('яйцо', '2', 'шт.'), ('яйцо', '50', 'г'),
+             ('яйцо', '30', 'мл')],
+        )
+
+    def test_rows_keep_first_appearance_order(self):
+        rows = consolidate([('сахар', 'г', 10), ('соль', 'г', 1),
+                            ('сахар', 'кг', 1)])
+        self.assertEqual([name for name, _, _ in rows], ['сахар', 'соль'])
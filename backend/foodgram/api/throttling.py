@@ -0,0 +1,160 @@
+"""Ограничение частоты запросов к изменяющим эндпоинтам.
+
+Скользящее окно: запросы считаются в окнах длиной в период, и к
+текущему окну добавляется доля предыдущего, пропорциональная
+непрошедшей части периода. Так N запросов нельзя повторить сразу
+после границы окна. Счётчики меняются только атомарными add и incr,
+поэтому одновременные запросы одного клиента не проходят сверх
+лимита. С общим кэшем (Redis, Memcached) лимит общий для всех
+воркеров, с locmem — свой в каждом процессе.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+from foodgram.db import get_pool_wait
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    cache = caches[settings.THROTTLE_CACHE]
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        window, elapsed = divmod(self.timer(), self.duration)
+        key = f'{self.key}_{int(window)}'
+        # Окно хранится два периода: следующее читает его как прошлое.
+        self.cache.add(key, 0, self.duration * 2)
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            # Запись вытеснена между add и incr.
+            self.cache.set(key, 1, self.duration * 2)
+            count = 1
+        previous = self.cache.get(f'{self.key}_{int(window) - 1}', 0)
+        weight = 1 - elapsed / self.duration
+        if previous * weight + count <= self.num_requests:
+            self.recorded_key = key
+            return True
+        # Отклонённый запрос не занимает место в лимите.
+        self.cache.decr(key)
+        count -= 1
+        if previous and count < self.num_requests:
+            # Ждём, пока доля прошлого окна не уменьшится до свободного
+            # места под один запрос.
+            free = (self.num_requests - 1 - count) / previous
+            self.wait_time = max(0, (1 - free) * self.duration - elapsed)
+        else:
+            self.wait_time = self.duration - elapsed
+        return False
+
+    def wait(self):
+        return self.wait_time
+
+    def undo(self):
+        """Снимает засчитанный запрос, если его отклонил другой лимит."""
+        key = getattr(self, 'recorded_key', None)
+        if key is None:
+            return
+        self.recorded_key = None
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            pass
+
+
+class UserWriteThrottle(SlidingWindowThrottle):
+    """Лимит на пользователя (для анонимов — на IP)."""
+    scope = 'write_user'
+
+    def get_cache_key(self, request, view):
+        if request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class IPWriteThrottle(SlidingWindowThrottle):
+    """Общий лимит на IP, в том числе для нескольких аккаунтов."""
+    scope = 'write_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope, 'ident': self.get_ident(request)
+        }
+
+
+class WriteThrottle(BaseThrottle):
+    """Лимиты на пользователя и на IP вместе.
+
+    DRF спрашивает все троттлы, даже если один уже отказал, и лимит,
+    пропустивший запрос, засчитал бы его. Здесь запрос засчитывается
+    либо во всех лимитах, либо ни в одном.
+    """
+    throttle_classes = (UserWriteThrottle, IPWriteThrottle)
+
+    def allow_request(self, request, view):
+        allowed = []
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            if not throttle.allow_request(request, view):
+                for passed in allowed:
+                    passed.undo()
+                self.wait_time = throttle.wait()
+                return False
+            allowed.append(throttle)
+        return True
+
+    def wait(self):
+        return self.wait_time
+
+
+class EventStreamThrottle(UserWriteThrottle):
+    """Лимит на открытие потоков /api/events/ пользователем.
+
+    Число одновременно открытых потоков ограничивает брокер
+    (EVENTS_MAX_STREAMS), лимит частоты не даёт переподключаться
+    в цикле.
+    """
+    scope = 'events'
+
+
+class ServiceUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервис перегружен, повторите запрос позже.'
+    default_code = 'service_unavailable'
+
+    def __init__(self, wait):
+        super().__init__()
+        # DRF выставляет по этому атрибуту заголовок Retry-After.
+        self.wait = wait
+
+
+class LoadSheddingThrottle(BaseThrottle):
+    """Отклоняет второстепенные запросы, пока база не справляется.
+
+    Перегрузка определяется по среднему ожиданию соединения в пуле
+    (DB_POOL=True). Без пула запросы не отклоняются.
+    """
+    def allow_request(self, request, view):
+        threshold = settings.LOAD_SHEDDING_POOL_WAIT
+        if threshold and get_pool_wait() > threshold:
+            raise ServiceUnavailable(
+                math.ceil(settings.LOAD_SHEDDING_RETRY_AFTER)
+            )
+        return True
+
+
+# Отклонённый по нагрузке запрос не доходит до WriteThrottle
+# и не занимает лимит.
+WRITE_THROTTLES = (LoadSheddingThrottle, WriteThrottle)
+CRITICAL_WRITE_THROTTLES = (WriteThrottle,)
@@ -0,0 +1,92 @@
+"""Приведение единиц измерения в списке покупок.
+
+Единицы из data/ingredients.csv, которые можно перевести друг в друга
+без плотности продукта, связаны рёбрами графа UNIT_CONVERSIONS. При
+загрузке модуля граф обходится один раз, и для каждой единицы
+запоминается базовая единица её компоненты и множитель перевода
+в неё. Единицы вне графа («шт.», «по вкусу», «пучок»...) остаются
+самостоятельными.
+"""
+from decimal import Decimal
+from fractions import Fraction
+
+# (единица, базовая единица, сколько базовых в одной единице)
+UNIT_CONVERSIONS = (
+    ('кг', 'г', '1000'),
+    ('л', 'мл', '1000'),
+    ('стакан', 'мл', '250'),
+    ('ст. л.', 'мл', '15'),
+    ('ч. л.', 'мл', '5'),
+    ('капля', 'мл', '0.05'),
+)
+# Крупные единицы для вывода больших сумм в базовых единицах.
+DISPLAY_UNITS = {
+    'г': ('кг', 1000),
+    'мл': ('л', 1000),
+}
+
+
+def build_unit_table(conversions):
+    """Базовая единица и множитель для каждой единицы графа.
+
+    Базовые — единицы, которые встречаются только справа в рёбрах.
+    Множители хранятся дробями, чтобы обратные переводы были точными.
+    """
+    graph = {}
+    for unit, other, factor in conversions:
+        factor = Fraction(factor)
+        graph.setdefault(unit, []).append((other, factor))
+        graph.setdefault(other, []).append((unit, 1 / factor))
+    bases = {other for _, other, _ in conversions} - {
+        unit for unit, _, _ in conversions
+    }
+    table = {}
+    for base in sorted(bases):
+        table[base] = (base, Fraction(1))
+        stack = [base]
+        while stack:
+            unit = stack.pop()
+            for other, factor in graph[unit]:
+                if other not in table:
+                    # Одна единица other равна 1 / factor единиц unit.
+                    table[other] = (base, table[unit][1] / factor)
+                    stack.append(other)
+    return table
+
+
+UNITS = build_unit_table(UNIT_CONVERSIONS)
+
+
+def format_amount(amount):
+    amount = Decimal(amount.numerator) / Decimal(amount.denominator)
+    return f'{amount.quantize(Decimal("0.01")).normalize():f}'
+
+
+def consolidate(rows):
+    """Объединяет строки списка покупок за один проход.
+
+    rows — пары (название, единица, количество), уже просуммированные
+    в базе по исходной единице. Строки одного ингредиента в
+    совместимых единицах складываются в базовой единице; если единица
+    была одна, строка выводится без изменений. Возвращает список
+    (название, количество, единица) в порядке первого появления.
+    """
+    groups = {}
+    for name, unit, amount in rows:
+        base, factor = UNITS.get(unit, (unit, Fraction(1)))
+        group = groups.setdefault((name, base), [Fraction(0), set()])
+        group[0] += amount * factor
+        group[1].add(unit)
+    result = []
+    for (name, base), (total, units) in groups.items():
+        if len(units) == 1:
+            (unit,) = units
+            total /= UNITS.get(unit, (unit, Fraction(1)))[1]
+        else:
+            unit = base
+            if base in DISPLAY_UNITS:
+                display, factor = DISPLAY_UNITS[base]
+                if total >= factor:
+                    unit, total = display, total / factor
+        result.append((name, format_amount(total), unit))
+    return result
@@ -1,8 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (IngredientViewSet, RecipeViewSet,
-                    TagsViewSet, UserViewSet)
+from .views import (EventViewSet, IngredientViewSet, RecipeViewSet,
+                    SyncViewSet, TagsViewSet, UserViewSet)
 
 router = DefaultRouter()
 
@@ -10,6 +10,8 @@ router.register(r'tags', TagsViewSet, basename='tags')
 router.register(r'ingredients', IngredientViewSet, basename='ingredients')
 router.register(r'recipes', RecipeViewSet, basename='recipes')
 router.register(r'users', UserViewSet, basename='users')
+router.register(r'sync', SyncViewSet, basename='sync')
+router.register(r'events', EventViewSet, basename='events')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,10 +1,17 @@
 import base64
+import os
+import tempfile
+from urllib.parse import quote
 
+from django.conf import settings
 from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.serializers import ImageField
 
+from recipes.signals import delete_user_recipes
+
 
 class Base64ImageField(ImageField):
     """Функция для работы с изображениями."""
@@ -39,5 +46,56 @@ def delete_model_instance(request, model_name, instance, error_message):
                                      recipe=instance).exists():
         return Response({'errors': error_message},
                         status=status.HTTP_400_BAD_REQUEST)
-    model_name.objects.filter(user=request.user, recipe=instance).delete()
+    delete_user_recipes(
+        model_name.objects.filter(user=request.user, recipe=instance)
+    )
     return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def write_file(path, content):
+    """Атомарно записывает файл: читатель видит старую или новую версию."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(descriptor, 'wb') as file:
+        file.write(content)
+    # mkstemp создаёт файл с правами 0600, а его читает nginx.
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, path)
+
+
+def write_protected_file(relative_path, content):
+    """Атомарно записывает файл в PROTECTED_MEDIA_ROOT.
+
+    Имя файла должно зависеть от содержимого: готовый файл не
+    перезаписывается, у него только обновляется время изменения.
+    Старые версии удаляет команда prune_protected_files, поэтому
+    ответ, уже отданный со старым путём, не ломается.
+    """
+    path = os.path.join(settings.PROTECTED_MEDIA_ROOT, relative_path)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        write_file(path, content)
+    return relative_path
+
+
+def protected_file_response(relative_path, filename, content_type):
+    """Отдаёт файл из PROTECTED_MEDIA_ROOT после проверки прав во view.
+
+    С MEDIA_ACCEL_REDIRECT файл отправляет nginx по заголовку
+    X-Accel-Redirect, воркер не читает его содержимое.
+    """
+    if settings.MEDIA_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (
+            settings.PROTECTED_MEDIA_URL + quote(relative_path)
+        )
+    else:
+        response = FileResponse(
+            open(os.path.join(settings.PROTECTED_MEDIA_ROOT, relative_path),
+                 'rb'),
+            content_type=content_type,
+        )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -1,43 +1,66 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+import ipaddress
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.http import (HttpResponse, HttpResponseForbidden,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as BaseUserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import Throttled, ValidationError
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.viewsets import ModelViewSet, ViewSet
 
-from recipes.models import (Favorite, Ingredient, Recipe, Shoppingcart,
-                            Subscription, Tag, RecipeIngredients)
+from foodgram.metrics import render_metrics
+from recipes.models import (Favorite, Ingredient, Recipe,
+                            SharedShoppingList, Shoppingcart, Subscription,
+                            Tag)
+from recipes.signals import delete_user_recipes
 from users.models import User
 
+from .cache import (get_recipe_data, get_user_flags, recipe_etag,
+                    represent_recipe, represent_recipes)
+from .events import (EventStream, StreamLimitExceeded, get_broker,
+                     publish_event)
 from .filters import IngredientFilter, RecipeFilter
-from .mixins import TagsIngredientMixin
+from .ingredient_index import INDEX as INGREDIENT_INDEX
+from .mixins import ReplicaReadMixin, TagsIngredientMixin
 from .permissions import IsAdminAuthorOrReadOnly
-from .serializers import (FavoriteSerializer, IngredientSerializer,
+from .renderers import EventStreamRenderer, FastJSONRenderer
+from .serializers import (FavoriteSerializer, IngredientReadSerializer,
                           RecipeGetSerializer, RecipePostSerializer,
-                          TagsSerializer, ShoppingCartSerializer,
-                          UserSubscriptionSerializer,
-                          UserSubscriptionsGetSerializer)
+                          ShoppingCartSerializer, TagsReadSerializer,
+                          UserSubscriptionSerializer)
+from .shopping_list import get_shopping_list, share_shopping_list
+from .sync import sync
+from .throttling import (CRITICAL_WRITE_THROTTLES, WRITE_THROTTLES,
+                         EventStreamThrottle)
+from .utils import protected_file_response
 
 
 class TagsViewSet(TagsIngredientMixin):
 
     queryset = Tag.objects.all()
-    serializer_class = TagsSerializer
+    serializer_class = TagsReadSerializer
 
 
 class IngredientViewSet(TagsIngredientMixin):
 
     queryset = Ingredient.objects.all()
-    serializer_class = IngredientSerializer
+    serializer_class = IngredientReadSerializer
     filterset_class = IngredientFilter
     filters_backend = (DjangoFilterBackend,)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, ModelViewSet):
 
     queryset = Recipe.objects.all()
     filterset_class = RecipeFilter
@@ -50,9 +73,48 @@ class RecipeViewSet(ModelViewSet):
             return RecipeGetSerializer
         return RecipePostSerializer
 
+    def get_throttles(self):
+        if self.action == 'create':
+            return [throttle() for throttle in CRITICAL_WRITE_THROTTLES]
+        return super().get_throttles()
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(represent_recipes(list(queryset), request))
+        return self.get_paginated_response(
+            represent_recipes(page, request)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe = self.get_object()
+        flags = get_user_flags(request.user, [recipe])
+        etag = recipe_etag(recipe, flags)
+        # Флаги пользователя меняются без изменения рецепта,
+        # поэтому Last-Modified отдаётся только анонимам.
+        last_modified = None
+        if not request.user.is_authenticated:
+            last_modified = int(recipe.updated_at.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = Response(represent_recipe(
+                get_recipe_data(recipe), flags, request
+            ))
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True)
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
     @staticmethod
     def create_model_instance(request, instance, serializer_name):
         serializer = serializer_name(
@@ -61,6 +123,9 @@ class RecipeViewSet(ModelViewSet):
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        publish_event(request.user.id,
+                      serializer_name.Meta.model._meta.model_name,
+                      'added', instance.id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @staticmethod
@@ -69,12 +134,17 @@ class RecipeViewSet(ModelViewSet):
                                     recipe=instance).exists():
             return Response({'errors': error_message},
                             status=status.HTTP_400_BAD_REQUEST)
-        model.objects.filter(user=request.user, recipe=instance).delete()
+        delete_user_recipes(
+            model.objects.filter(user=request.user, recipe=instance)
+        )
+        publish_event(request.user.id, model._meta.model_name, 'removed',
+                      instance.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         detail=True,
         methods=('POST',),
+        throttle_classes=WRITE_THROTTLES,
     )
     def favorite(self, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
@@ -98,6 +168,7 @@ class RecipeViewSet(ModelViewSet):
     @action(
         detail=True,
         methods=('POST',),
+        throttle_classes=WRITE_THROTTLES,
     )
     def shopping_cart(self, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
@@ -118,30 +189,116 @@ class RecipeViewSet(ModelViewSet):
             error_message
         )
 
+    @action(detail=True, methods=('GET',))
+    def similar(self, request, pk):
+        """Похожие рецепты из таблицы, построенной build_recommendations."""
+        recipes = list(Recipe.objects.filter(
+            similar_to__recipe=pk
+        ).order_by('-similar_to__score'))
+        if not recipes:
+            get_object_or_404(Recipe, pk=pk)
+        return Response(represent_recipes(recipes, request))
+
+    @action(
+        detail=False,
+        methods=('GET',),
+        permission_classes=(IsAuthenticated,)
+    )
+    def recommended(self, request):
+        """Соседи избранных рецептов пользователя по сумме сходства."""
+        user = request.user
+        queryset = Recipe.objects.filter(
+            similar_to__recipe__favoriterecipe__user=user
+        ).exclude(
+            favoriterecipe__user=user
+        ).exclude(
+            author=user
+        ).annotate(
+            recommendation_score=Sum('similar_to__score')
+        ).order_by('-recommendation_score', '-id')
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(represent_recipes(page, request))
+
+    @action(detail=False, methods=('GET',))
+    def what_to_cook(self, request):
+        """Рецепты по имеющимся ингредиентам, по убыванию покрытия.
+
+        Параметры: ingredients — id через запятую или повторением,
+        min_coverage — минимальная доля имеющихся ингредиентов (0..1).
+        """
+        try:
+            ingredient_ids = [
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',') if value
+            ]
+            min_coverage = float(request.query_params.get('min_coverage', 0))
+        except ValueError:
+            raise ValidationError(
+                'ingredients — целые числа, min_coverage — число от 0 до 1'
+            )
+        if not ingredient_ids:
+            raise ValidationError('Укажите хотя бы один ингредиент')
+        page = self.paginate_queryset(
+            INGREDIENT_INDEX.search(ingredient_ids, min_coverage)
+        )
+        recipes = Recipe.objects.in_bulk([recipe_id for recipe_id, *_ in page])
+        found = [item for item in page if item[0] in recipes]
+        data = represent_recipes(
+            [recipes[recipe_id] for recipe_id, *_ in found], request
+        )
+        for item, (_, matched, total) in zip(data, found):
+            item['coverage'] = round(matched / total, 2)
+            item['missing'] = total - matched
+        return self.get_paginated_response(data)
+
     @action(
         detail=False,
         methods=['get'],
         permission_classes=[IsAuthenticated, ]
     )
     def download_shopping_cart(self, request):
+        return protected_file_response(
+            get_shopping_list(request.user.id),
+            'cart.txt',
+            'text/plain; charset=utf-8',
+        )
 
-        ingredients = RecipeIngredients.objects.filter(
-            recipe__shoppingrecipe__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(ingredient_amount=Sum('amount'))
-        shopping_list = ['Список покупок:\n']
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['ingredient_amount']
-            shopping_list.append(f'\n{name} - {amount}, {unit}')
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = 'attachment; filename="cart.txt"'
-        return response
+    @action(
+        detail=False,
+        methods=('GET', 'POST', 'DELETE'),
+        permission_classes=(IsAuthenticated,),
+    )
+    def share_shopping_cart(self, request):
+        """Публичная ссылка на список покупок, см. api/shopping_list.py."""
+        if request.method == 'POST':
+            shared, created = share_shopping_list(request.user.id)
+        else:
+            shared = SharedShoppingList.objects.filter(
+                user=request.user
+            ).first()
+            created = False
+        if shared is None:
+            return Response(
+                {'errors': 'Список покупок не опубликован'},
+                status=(status.HTTP_404_NOT_FOUND if request.method == 'GET'
+                        else status.HTTP_400_BAD_REQUEST),
+            )
+        if request.method == 'DELETE':
+            shared.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(
+            {
+                'token': shared.token,
+                'url': request.build_absolute_uri(
+                    settings.SHARED_LIST_URL + shared.token
+                ),
+            },
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
 
 
-class UserViewSet(BaseUserViewSet):
+class UserViewSet(ReplicaReadMixin, BaseUserViewSet):
 
     queryset = User.objects.all()
 
@@ -153,7 +310,8 @@ class UserViewSet(BaseUserViewSet):
     @action(
         methods=('POST',),
         detail=True,
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        throttle_classes=WRITE_THROTTLES,
     )
     def subscribe(self, request, id=None):
         serializer = UserSubscriptionSerializer(
@@ -165,6 +323,8 @@ class UserViewSet(BaseUserViewSet):
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        publish_event(request.user.id, 'subscription', 'added',
+                      serializer.instance.author_id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
@@ -180,20 +340,120 @@ class UserViewSet(BaseUserViewSet):
             user=request.user.id,
             author=following.id
         ).delete()
+        publish_event(request.user.id, 'subscription', 'removed',
+                      following.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         detail=False, methods=('GET',),
     )
     def subscriptions(self, request):
-        return self.get_paginated_response(
-            UserSubscriptionsGetSerializer(
-                self.paginate_queryset(
-                    User.objects.filter(
-                        following__user=self.request.user
-                    ),
-                ),
-                many=True,
-                context={'request': request}
-            ).data
+        authors = self.paginate_queryset(
+            User.objects.filter(
+                following__user=self.request.user
+            ).annotate(recipes_count=Count('recipes')).order_by('id')
+        )
+        recipes = list(Recipe.objects.filter(author__in=authors))
+        recipes_by_author = defaultdict(list)
+        for recipe, data in zip(recipes,
+                                represent_recipes(recipes, request)):
+            recipes_by_author[recipe.author_id].append(data)
+        return self.get_paginated_response([
+            {
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+                'is_subscribed': True,
+                'id': author.id,
+                'username': author.username,
+                'email': author.email,
+                'recipes': recipes_by_author[author.id],
+                'recipes_count': author.recipes_count,
+            }
+            for author in authors
+        ])
+
+
+class SyncViewSet(ViewSet):
+    """Изменения после токена синхронизации, см. api/sync.py.
+
+    Реплики не используются: отставание реплики дольше перекрытия
+    токенов приводит к пропущенным изменениям.
+    """
+    permission_classes = (AllowAny,)
+
+    @action(detail=False, methods=('GET',))
+    def tags(self, request):
+        return Response(sync('tags', request))
+
+    @action(detail=False, methods=('GET',))
+    def ingredients(self, request):
+        return Response(sync('ingredients', request))
+
+    @action(detail=False, methods=('GET',))
+    def recipes(self, request):
+        return Response(sync('recipes', request))
+
+    @action(
+        detail=False, methods=('GET',), permission_classes=(IsAuthenticated,)
+    )
+    def favorites(self, request):
+        return Response(sync('favorites', request))
+
+    @action(
+        detail=False, methods=('GET',), permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart(self, request):
+        return Response(sync('shopping_cart', request))
+
+
+class EventViewSet(ViewSet):
+    """Поток событий избранного, корзины и подписок, см. api/events.py."""
+    renderer_classes = (EventStreamRenderer, FastJSONRenderer)
+    throttle_classes = (EventStreamThrottle,)
+
+    def list(self, request):
+        try:
+            last_id = int(request.headers['Last-Event-ID'])
+        except (KeyError, ValueError):
+            last_id = None
+        # Подписка до ответа: превышение лимита — обычная ошибка 429,
+        # а не оборванный поток.
+        try:
+            subscription = get_broker().subscribe(request.user.id, last_id)
+        except StreamLimitExceeded:
+            raise Throttled(detail='Слишком много открытых потоков событий.')
+        response = StreamingHttpResponse(
+            EventStream(subscription),
+            content_type='text/event-stream; charset=utf-8',
         )
+        response['Cache-Control'] = 'no-cache'
+        # nginx не должен буферизовать поток.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+def metrics_allowed(request):
+    """Доступ к метрикам: по токену METRICS_TOKEN, а без него только
+    для прямых запросов из внутренней сети, минуя nginx."""
+    if settings.METRICS_TOKEN:
+        return constant_time_compare(
+            request.headers.get('Authorization', ''),
+            f'Bearer {settings.METRICS_TOKEN}',
+        )
+    if 'X-Forwarded-For' in request.headers:
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return address.is_private
+
+
+def metrics(request):
+    """Метрики приложения в формате Prometheus."""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render_metrics(settings.METRICS_DIR),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,165 @@
+"""Обработка больших выборок и файлов пачками в ограниченной памяти.
+
+QuerySet по умолчанию кэширует все строки результата, а json.load
+читает файл целиком. Функции модуля отдают данные порциями, так что
+память команды зависит от размера пачки, а не от размера таблицы.
+"""
+import itertools
+import json
+import os
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_CHUNK_SIZE = 2000
+JSON_BUFFER_SIZE = 64 * 1024
+
+
+def chunked(iterable, size):
+    """Разбивает итератор на списки длиной не больше size."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iterate_objects(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Экземпляры моделей без кэша результатов QuerySet.
+
+    В PostgreSQL строки читаются серверным курсором по chunk_size,
+    в остальных базах — через fetchmany.
+    """
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def iterate_values(queryset, *fields, flat=False,
+                   chunk_size=DEFAULT_CHUNK_SIZE):
+    """Кортежи значений полей без создания экземпляров моделей."""
+    return queryset.values_list(*fields, flat=flat).iterator(
+        chunk_size=chunk_size
+    )
+
+
+def _key_value(row, field, attname):
+    if isinstance(row, tuple):
+        return row[0]
+    if isinstance(row, dict):
+        return row[field]
+    return getattr(row, attname)
+
+
+def iterate_batches(queryset, batch_size=DEFAULT_CHUNK_SIZE, field='pk'):
+    """Пачки по возрастанию уникального поля без OFFSET.
+
+    Каждая пачка — отдельный запрос WHERE field > последнее значение,
+    поэтому курсор не держится открытым между пачками, а к пачке можно
+    применить prefetch_related_objects. Для values_list ключевое поле
+    должно идти первым.
+    """
+    meta = queryset.model._meta
+    attname = (meta.pk if field == 'pk' else meta.get_field(field)).attname
+    queryset = queryset.order_by(field)
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            page = page.filter(**{f'{field}__gt': last})
+        batch = list(page[:batch_size])
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        last = _key_value(batch[-1], field, attname)
+
+
+def iterate_json_array(file, buffer_size=JSON_BUFFER_SIZE):
+    """Элементы JSON-массива из файла по одному.
+
+    Файл читается порциями, очередной элемент разбирается
+    JSONDecoder.raw_decode. Если элемент обрывается на границе порции,
+    дочитывается следующая, вдвое большая, и разбор повторяется.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    state = 'start'
+    read_size = buffer_size
+    while True:
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+        if position == len(buffer) and not eof:
+            chunk = file.read(read_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        char = buffer[position:position + 1]
+        if state == 'start':
+            if char != '[':
+                raise ValueError('JSON array expected')
+            position += 1
+            state = 'first'
+        elif state in ('first', 'after') and char == ']':
+            return
+        elif state == 'after':
+            if char != ',':
+                raise ValueError(f'"," or "]" expected at {char!r}')
+            position += 1
+            state = 'value'
+        else:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = len(buffer)
+            # За элементом должен быть виден разделитель, иначе элемент
+            # мог оборваться на границе порции (например, число 1.5 —
+            # на «1.»), и разбор повторяется с дочитанным буфером.
+            after = end
+            while after < len(buffer) and buffer[after].isspace():
+                after += 1
+            if buffer[after:after + 1] not in (',', ']') and not eof:
+                chunk = file.read(read_size)
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+                read_size *= 2
+                continue
+            yield item
+            position = end
+            read_size = buffer_size
+            state = 'after'
+
+
+def memory_usage():
+    """Текущий и пиковый размер процесса в памяти (RSS) в байтах.
+
+    Значения, недоступные на платформе, равны None.
+    """
+    current = peak = None
+    try:
+        with open('/proc/self/statm') as statm:
+            current = int(statm.read().split()[1]) * os.sysconf(
+                'SC_PAGE_SIZE'
+            )
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # В Linux ru_maxrss в килобайтах, в macOS — в байтах.
+        if sys.platform != 'darwin':
+            peak *= 1024
+    return current, peak
+
+
+def memory_report():
+    """Строка вида «RSS 48.2 MiB, peak 63.0 MiB» для вывода команд."""
+    parts = []
+    for label, value in zip(('RSS', 'peak'), memory_usage()):
+        if value is not None:
+            parts.append(f'{label} {value / 2 ** 20:.1f} MiB')
+    return ', '.join(parts) or 'memory usage unavailable'
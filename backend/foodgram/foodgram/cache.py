@@ -0,0 +1,13 @@
+"""Общие сведения о настроенном кэше."""
+from django.conf import settings
+
+# Бэкенды, данные которых видны только текущему процессу.
+PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def is_cache_shared(alias='default'):
+    """Видят ли записи кэша alias другие процессы и воркеры."""
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
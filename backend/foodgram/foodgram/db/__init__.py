@@ -0,0 +1,59 @@
+import time
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+# Соединение, которым пользовались недавно, не проверяется: SELECT 1 на
+# каждый запрос стоил бы больше, чем редкий разрыв простаивающего
+# соединения. Соединения с ошибками закрывает сам Django
+# (close_old_connections по errors_occurred).
+HEALTH_CHECK_IDLE_SECONDS = 10
+
+
+def check_connections_health(**kwargs):
+    """Закрывает постоянные соединения, которые перестали отвечать.
+
+    В Django 4.1+ то же самое делает настройка CONN_HEALTH_CHECKS,
+    здесь она поддерживается для Django 3.2. Как и в 4.1, проверяется
+    только переиспользуемое соединение, и только если оно простаивало
+    дольше HEALTH_CHECK_IDLE_SECONDS.
+    """
+    now = time.monotonic()
+    for connection in connections.all():
+        if (connection.settings_dict.get('CONN_HEALTH_CHECKS')
+                and connection.connection is not None
+                and now - getattr(connection, 'last_used_at', 0)
+                > HEALTH_CHECK_IDLE_SECONDS
+                and not connection.is_usable()):
+            connection.close()
+
+
+def mark_connections_used(**kwargs):
+    """Запоминает время конца запроса для check_connections_health."""
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.last_used_at = now
+
+
+def get_pool_wait(alias=DEFAULT_DB_ALIAS):
+    """Среднее время ожидания соединения из пула, 0 без пула."""
+    pool = getattr(connections[alias], 'pool', None)
+    return pool.average_wait if pool is not None else 0.0
+
+
+@contextmanager
+def read_snapshot(using=DEFAULT_DB_ALIAS):
+    """Транзакция, все запросы которой читают один снимок базы.
+
+    В PostgreSQL на уровне READ COMMITTED каждый запрос видит свой
+    снимок, поэтому транзакция переводится в REPEATABLE READ. В SQLite
+    читающая транзакция и так видит один снимок.
+    """
+    with transaction.atomic(using=using):
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL '
+                               'REPEATABLE READ READ ONLY')
+        yield
@@ -0,0 +1,116 @@
+"""PostgreSQL-бэкенд с пулом соединений внутри процесса."""
+import os
+import threading
+import time
+from functools import partial
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from foodgram.db import HEALTH_CHECK_IDLE_SECONDS
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Ограниченный пул соединений с учётом времени ожидания."""
+    # Вес последнего ожидания в скользящем среднем average_wait.
+    WAIT_SMOOTHING = 0.2
+
+    def __init__(self, max_size, timeout):
+        self.timeout = timeout
+        self.last_wait = 0.0
+        self.average_wait = 0.0
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def get(self, connect):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise base.Database.OperationalError(
+                'Нет свободных соединений в пуле за %s с.' % self.timeout
+            )
+        self.last_wait = time.monotonic() - started
+        self.average_wait += (
+            (self.last_wait - self.average_wait) * self.WAIT_SMOOTHING
+        )
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, returned_at = self._idle.pop()
+            if connection.closed:
+                continue
+            # Как и check_connections_health, проверяется только
+            # соединение, которое простаивало: после перезапуска сервера
+            # или тайм-аута простоя сокет уже мёртв.
+            if (time.monotonic() - returned_at <= HEALTH_CHECK_IDLE_SECONDS
+                    or self.is_alive(connection)):
+                return connection
+            connection.close()
+        try:
+            return connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    @staticmethod
+    def is_alive(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if (connection.info.transaction_status
+                    != extensions.TRANSACTION_STATUS_IDLE):
+                connection.rollback()
+        except base.Database.Error:
+            return False
+        return True
+
+    def put(self, connection):
+        try:
+            if connection.closed:
+                return
+            status = connection.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                connection.close()
+                return
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+        except base.Database.Error:
+            connection.close()
+        finally:
+            self._slots.release()
+
+
+def get_pool(alias, settings_dict):
+    """Пул создаётся лениво в каждом процессе (после fork у gunicorn)."""
+    key = (alias, os.getpid())
+    with _pools_lock:
+        if key not in _pools:
+            options = settings_dict.get('POOL', {})
+            _pools[key] = ConnectionPool(
+                max_size=options.get('MAX_SIZE', 10),
+                timeout=options.get('TIMEOUT', 10),
+            )
+        return _pools[key]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        return self.pool.get(
+            partial(super().get_new_connection, conn_params)
+        )
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.put(self.connection)
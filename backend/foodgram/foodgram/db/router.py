@@ -0,0 +1,39 @@
+"""Маршрутизация чтения на реплики.
+
+Чтение уходит на реплику, только когда установлен read_replica: его
+задаёт ReplicaReadMixin для безопасных запросов API. Реплика выбирается
+один раз на запрос, чтобы все его запросы видели данные с одинаковым
+отставанием. Всё остальное, включая запись, миграции и чтение в админке
+и командах, идёт в default.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Алиас реплики для чтения в текущем запросе, None — читать из default.
+read_replica = ContextVar('read_replica', default=None)
+
+
+def choose_replica():
+    """Реплика для запроса или None, если реплик нет."""
+    if not settings.REPLICA_DATABASES:
+        return None
+    return random.choice(settings.REPLICA_DATABASES)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return read_replica.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и default.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,292 @@
+"""Метрики в формате Prometheus.
+
+Общий реестр для веб-процессов и команды run_jobs. Значения хранятся
+в памяти процесса. Под gunicorn воркеры раз в METRICS_FLUSH_SECONDS
+сохраняют снимок реестра в общий каталог METRICS_DIR (см.
+gunicorn.conf.py), и /metrics складывает снимки всех воркеров:
+Prometheus видит один процесс на контейнер и не может различить
+воркеры сам. Счётчики завершившихся воркеров переносятся в архив,
+чтобы суммы не уменьшались при перезапуске воркера по max_requests.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+logger = logging.getLogger(__name__)
+
+
+def format_labels(labels, **extra):
+    items = [*labels, *extra.items()]
+    if not items:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('"', '\\"'))
+        for name, value in items
+    )
+    return '{' + pairs + '}'
+
+
+class Counter:
+    type = 'counter'
+    buckets = ()
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] += amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(
+                key, ([0] * (len(self.buckets) + 1), 0.0)
+            )
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def values(self):
+        with self._lock:
+            return {
+                key: (list(counts), total)
+                for key, (counts, total) in self._values.items()
+            }
+
+
+def render_samples(name, metric_type, buckets, values):
+    if metric_type != 'histogram':
+        for labels, value in values.items():
+            yield f'{name}{format_labels(labels)} {value}'
+        return
+    for labels, (counts, total) in values.items():
+        cumulative = 0
+        for bound, count in zip(buckets, counts):
+            cumulative += count
+            yield '{}_bucket{} {}'.format(
+                name, format_labels(labels, le=bound), cumulative
+            )
+        cumulative += counts[-1]
+        yield '{}_bucket{} {}'.format(
+            name, format_labels(labels, le='+Inf'), cumulative
+        )
+        yield f'{name}_count{format_labels(labels)} {cumulative}'
+        yield f'{name}_sum{format_labels(labels)} {total}'
+
+
+def render(snapshot):
+    """Текст для Prometheus из снимка Registry.snapshot()."""
+    lines = []
+    for name, metric in snapshot.items():
+        lines.append(f'# HELP {name} {metric["documentation"]}')
+        lines.append(f'# TYPE {name} {metric["type"]}')
+        lines.extend(render_samples(
+            name, metric['type'], metric['buckets'], metric['values']
+        ))
+    return '\n'.join(lines) + '\n'
+
+
+def merge(snapshots):
+    """Складывает снимки процессов: пары (pid, снимок).
+
+    Счётчики и гистограммы суммируются. Сумма значений gauge смысла не
+    имеет, поэтому они получают метку pid; у архива (pid None) их нет.
+    """
+    merged = {}
+    for pid, snapshot in snapshots:
+        for name, metric in snapshot.items():
+            values = merged.setdefault(name, {**metric, 'values': {}})[
+                'values'
+            ]
+            for labels, value in metric['values'].items():
+                if metric['type'] == 'gauge':
+                    if pid is not None:
+                        values[labels + (('pid', pid),)] = value
+                elif labels not in values:
+                    values[labels] = value
+                elif metric['type'] == 'histogram':
+                    counts, total = values[labels]
+                    values[labels] = (
+                        [a + b for a, b in zip(counts, value[0])],
+                        total + value[1],
+                    )
+                else:
+                    values[labels] += value
+    return merged
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name, *args):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = metric_class(name, *args)
+            return self._metrics[name]
+
+    def counter(self, name, documentation):
+        return self._register(Counter, name, documentation)
+
+    def gauge(self, name, documentation):
+        return self._register(Gauge, name, documentation)
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, buckets)
+
+    def snapshot(self):
+        return {
+            metric.name: {
+                'type': metric.type,
+                'documentation': metric.documentation,
+                'buckets': metric.buckets,
+                'values': metric.values(),
+            }
+            for metric in list(self._metrics.values())
+        }
+
+    def render(self):
+        return render(self.snapshot())
+
+
+class MetricsDirectory:
+    """Снимки реестров процессов в общем каталоге.
+
+    Каждый процесс пишет свой файл <pid>.json целиком и атомарно.
+    Файлы завершившихся процессов мастер gunicorn складывает в
+    archive.json. Сборка и перенос в архив разделены блокировкой,
+    чтобы значения не посчитались дважды или не пропали.
+    """
+    ARCHIVE = 'archive.json'
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def file(self, pid):
+        return self.path / f'{pid}.json'
+
+    @contextmanager
+    def locked(self, operation):
+        with open(self.path / '.lock', 'a') as lock:
+            fcntl.flock(lock, operation)
+            yield
+
+    def read(self, path):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return {}
+        for metric in data.values():
+            metric['values'] = {
+                tuple(map(tuple, labels)): value
+                for labels, value in metric['values']
+            }
+        return data
+
+    def write(self, snapshot, name):
+        data = {
+            metric_name: {**metric, 'values': list(metric['values'].items())}
+            for metric_name, metric in snapshot.items()
+        }
+        temporary = self.path / f'.{name}.tmp'
+        temporary.write_text(json.dumps(data))
+        os.replace(temporary, self.path / name)
+
+    def save(self, registry):
+        self.write(registry.snapshot(), self.file(os.getpid()).name)
+
+    def collect(self):
+        with self.locked(fcntl.LOCK_SH):
+            return merge(
+                (None if path.name == self.ARCHIVE else path.stem,
+                 self.read(path))
+                for path in sorted(self.path.glob('*.json'))
+            )
+
+    def archive(self, pid):
+        """Переносит счётчики завершившегося процесса в архив."""
+        path = self.file(pid)
+        with self.locked(fcntl.LOCK_EX):
+            if not path.exists():
+                return
+            self.write(merge([
+                (None, self.read(self.path / self.ARCHIVE)),
+                (None, self.read(path)),
+            ]), self.ARCHIVE)
+            path.unlink()
+
+    def clear(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        for path in self.path.glob('*.json'):
+            path.unlink()
+
+    def start_saving(self, registry, interval):
+        """Сохраняет снимок реестра раз в interval секунд в фоне."""
+        def save_forever():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.save(registry)
+                except OSError:
+                    logger.exception('Failed to save metrics to %s',
+                                     self.path)
+
+        threading.Thread(target=save_forever, name='metrics', daemon=True
+                         ).start()
+
+
+def render_metrics(path=None):
+    """Метрики всех процессов из каталога path или только текущего."""
+    if not path:
+        return REGISTRY.render()
+    directory = MetricsDirectory(path)
+    # Свой снимок сохраняется сразу, чтобы ответ включал
+    # последние значения этого процесса.
+    directory.save(REGISTRY)
+    return render(directory.collect())
+
+
+REGISTRY = Registry()
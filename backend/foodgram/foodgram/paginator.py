@@ -0,0 +1,31 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки с оценкой числа строк для больших таблиц.
+
+    Для нефильтрованного списка в PostgreSQL берётся оценка из
+    статистики pg_class вместо COUNT(*) по всей таблице. Маленькие
+    таблицы и отфильтрованные списки считаются точно.
+    """
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where or query.distinct:
+            return super().count
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return super().count
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [self.object_list.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < self.exact_count_limit:
+            return super().count
+        return int(row[0])
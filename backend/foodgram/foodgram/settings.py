@@ -5,7 +5,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.getenv('SECRET_KEY')
 
-DEBUG = False
+DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '84.201.177.135']
 
@@ -17,17 +17,16 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django_filters',
-    'debug_toolbar',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
     'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -37,6 +36,26 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# debug_toolbar тянет за собой много модулей, поэтому подключается
+# только в режиме отладки.
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.insert(0, 'debug_toolbar.middleware.DebugToolbarMiddleware')
+
+# Метрики по представлениям для Prometheus (/metrics) и журнал медленных
+# запросов в формате JSON.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+# Каталог для сложения метрик воркеров gunicorn, его задаёт
+# gunicorn.conf.py. Пустое значение — метрики только текущего процесса.
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+# Токен Prometheus (Authorization: Bearer). Без него /metrics доступен
+# только напрямую из внутренней сети.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, 'api.middleware.InstrumentationMiddleware')
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -66,9 +85,29 @@ if os.getenv('POSTGRES', '') == 'True':
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
             'POSTGRES_DB': os.getenv('POSTGRES_DB', 'foodgram'),
             'HOST': os.getenv('DB_HOST', ''),
-            'PORT': os.getenv('DB_PORT', 5432)
+            'PORT': os.getenv('DB_PORT', 5432),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': os.getenv(
+                'DB_CONN_HEALTH_CHECKS', 'True'
+            ) == 'True',
+            # PgBouncer в режиме transaction pooling не поддерживает
+            # серверные курсоры.
+            'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+                'DB_PGBOUNCER', ''
+            ) == 'True',
         }
     }
+    if os.getenv('DB_POOL', '') == 'True':
+        # Соединения возвращаются в пул после каждого запроса,
+        # поэтому постоянные соединения Django не нужны.
+        DATABASES['default'].update({
+            'ENGINE': 'foodgram.db.postgresql_pool',
+            'CONN_MAX_AGE': 0,
+            'POOL': {
+                'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            },
+        })
 else:
     DATABASES = {
         'default': {
@@ -77,6 +116,38 @@ else:
         }
     }
 
+# Реплики для чтения через запятую: host[:port] для PostgreSQL или
+# пути к файлам для SQLite. На них идут безопасные запросы API,
+# кроме пользователей, писавших в последние REPLICA_STICKY_SECONDS.
+REPLICA_DATABASES = []
+for index, location in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1
+):
+    replica = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if replica['ENGINE'] == 'django.db.backends.sqlite3':
+        replica['NAME'] = location.strip()
+    else:
+        host, _, port = location.strip().partition(':')
+        replica.update(HOST=host, PORT=port or replica['PORT'])
+    DATABASES[f'replica{index}'] = replica
+    REPLICA_DATABASES.append(f'replica{index}')
+DATABASE_ROUTERS = ['foodgram.db.router.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
+# Для нескольких воркеров нужен общий кэш, например
+# CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Время жизни общей части рецепта в кэше, секунды.
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', 60 * 60 * 24))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -108,6 +179,20 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Файлы, доступ к которым проверяет Django (списки покупок и т.п.).
+# С MEDIA_ACCEL_REDIRECT=True их отдаёт nginx из internal-локации
+# PROTECTED_MEDIA_URL, иначе — сам Django.
+PROTECTED_MEDIA_ROOT = os.path.join(BASE_DIR, 'protected')
+PROTECTED_MEDIA_URL = '/protected-media/'
+MEDIA_ACCEL_REDIRECT = os.getenv('MEDIA_ACCEL_REDIRECT', 'False') == 'True'
+# Возраст в секундах, после которого prune_protected_files удаляет
+# файл, если в каталоге есть более новый.
+PROTECTED_FILE_TTL = int(os.getenv('PROTECTED_FILE_TTL', 60 * 60 * 24))
+
+# Адрес публичных списков покупок: файлы MEDIA_ROOT/shared/<token>.txt
+# отдаёт nginx, см. api/shopping_list.py.
+SHARED_LIST_URL = os.getenv('SHARED_LIST_URL', '/s/')
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
@@ -118,15 +203,75 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageLimitPagination',
     'PAGE_SIZE': 6,
+    # Лимиты для изменяющих эндпоинтов, см. api/throttling.py.
+    # Пустое значение отключает лимит.
+    'DEFAULT_THROTTLE_RATES': {
+        'write_user': os.getenv('THROTTLE_WRITE_USER_RATE', '60/min') or None,
+        'write_ip': os.getenv('THROTTLE_WRITE_IP_RATE', '300/min') or None,
+        'events': os.getenv('THROTTLE_EVENTS_RATE', '30/min') or None,
+    },
 }
 
+# Максимальный возраст индекса ингредиентов в секундах,
+# см. api/ingredient_index.py.
+INGREDIENT_INDEX_MAX_AGE = int(os.getenv('INGREDIENT_INDEX_MAX_AGE', 3600))
+
+# Дельта-синхронизация, см. api/sync.py: строк на страницу, перекрытие
+# токенов в секундах и срок хранения записей об удалении. Клиент
+# с токеном старше срока получает полный набор заново.
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', 500))
+SYNC_OVERLAP_SECONDS = int(os.getenv('SYNC_OVERLAP_SECONDS', 5))
+SYNC_TOMBSTONE_TTL = int(
+    os.getenv('SYNC_TOMBSTONE_TTL', 60 * 60 * 24 * 30)
+)
+
+# Поток событий пользователя, см. api/events.py. CacheBroker нужен
+# общий кэш, LocalBroker работает только в одном процессе. Потоки
+# держат поток воркера, поэтому /api/events/ лучше отдавать отдельным
+# пулом gunicorn, см. gunicorn.conf.py. EVENTS_MAX_STREAMS — потоков
+# на пользователя. Интервалы в секундах: опрос кэша, комментарий-пинг
+# и время жизни потока.
+EVENTS_BROKER = os.getenv('EVENTS_BROKER', 'api.events.CacheBroker')
+EVENTS_MAX_STREAMS = int(os.getenv('EVENTS_MAX_STREAMS', 3))
+EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', 1))
+EVENTS_HEARTBEAT = int(os.getenv('EVENTS_HEARTBEAT', 15))
+EVENTS_STREAM_TIMEOUT = int(os.getenv('EVENTS_STREAM_TIMEOUT', 300))
+
+# Кэш токенов для CachedTokenAuthentication: режим общего кэша Django
+# и время жизни записи в нём, размер LRU в процессе и время жизни
+# записи в LRU (отозванный токен действует в других процессах столько
+# же, поэтому оно короткое). Время в секундах.
+TOKEN_CACHE_SHARED = os.getenv('TOKEN_CACHE_SHARED', 'True') == 'True'
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_LOCAL_TTL = int(os.getenv('TOKEN_CACHE_LOCAL_TTL', 5))
+
+# Алиас кэша для состояния лимитов; для общего лимита на все воркеры
+# нужен общий кэш.
+THROTTLE_CACHE = os.getenv('THROTTLE_CACHE', 'default')
+
+# Если среднее ожидание соединения из пула (в секундах) выше порога,
+# второстепенные изменяющие запросы получают 503 с Retry-After.
+# 0 отключает сброс нагрузки.
+LOAD_SHEDDING_POOL_WAIT = float(os.getenv('LOAD_SHEDDING_POOL_WAIT', 0))
+LOAD_SHEDDING_RETRY_AFTER = int(os.getenv('LOAD_SHEDDING_RETRY_AFTER', 5))
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -142,3 +287,19 @@ DJOSER = {
 }
 
 INTERNAL_IPS = ['localhost']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['console'],
+            'level': os.getenv('API_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
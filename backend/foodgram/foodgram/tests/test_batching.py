@@ -0,0 +1,61 @@
+import io
+import json
+
+from django.test import SimpleTestCase
+
+from foodgram.batching import chunked, iterate_json_array
+
+
+class ChunkedTests(SimpleTestCase):
+
+    def test_chunks(self):
+        self.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(chunked([], 2)), [])
+
+
+class IterateJsonArrayTests(SimpleTestCase):
+
+    def parse(self, text, buffer_size):
+        return list(iterate_json_array(io.StringIO(text), buffer_size))
+
+    def test_matches_json_loads_for_any_buffer_size(self):
+        items = [
+            1.5, -20, 1e3, 'строка с , и ]', None, True, [], {},
+            {'name': 'мука', 'tags': [{'slug': 'a'}, {'slug': 'b'}]},
+            [[1, 2], [3, [4, 5]]], '\\"', 123456789,
+        ]
+        for text in (json.dumps(items), json.dumps(items, indent=4),
+                     json.dumps(items, ensure_ascii=False)):
+            for buffer_size in (1, 2, 3, 7, 64, 1 << 16):
+                with self.subTest(buffer_size=buffer_size, text=text[:20]):
+                    self.assertEqual(self.parse(text, buffer_size), items)
+
+    def test_number_split_on_chunk_boundary(self):
+        # Порция обрывается на «1.», которое без дочитывания
+        # разобралось бы как 1.
+        self.assertEqual(self.parse('[1.5,22.25]', 3), [1.5, 22.25])
+        self.assertEqual(self.parse('[10, 200]', 2), [10, 200])
+
+    def test_empty_array(self):
+        for text in ('[]', ' [ ] ', '\n[\n]\n'):
+            with self.subTest(text=text):
+                self.assertEqual(self.parse(text, 1), [])
+
+    def test_not_an_array(self):
+        with self.assertRaises(ValueError):
+            self.parse('{"a": 1}', 4)
+
+    def test_missing_separator(self):
+        with self.assertRaises(ValueError):
+            self.parse('[1 2]', 64)
+
+    def test_truncated_file(self):
+        with self.assertRaises(ValueError):
+            self.parse('[1, {"a": ', 4)
+
+    def test_reads_lazily(self):
+        items = iterate_json_array(io.StringIO('[1, 2, oops]'), 1)
+        self.assertEqual(next(items), 1)
+        self.assertEqual(next(items), 2)
+        with self.assertRaises(ValueError):
+            next(items)
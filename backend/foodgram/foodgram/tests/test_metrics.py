@@ -0,0 +1,70 @@
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from foodgram.metrics import MetricsDirectory, Registry, render
+
+
+def worker_registry(requests, duration, connections):
+    registry = Registry()
+    registry.counter('requests_total', 'Запросы.').inc(requests, view='a')
+    registry.histogram('duration_seconds', 'Время.', (1, 10)).observe(
+        duration
+    )
+    registry.gauge('connections', 'Соединения.').set(connections)
+    return registry
+
+
+class MetricsDirectoryTests(SimpleTestCase):
+
+    def setUp(self):
+        temporary = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary.cleanup)
+        self.directory = MetricsDirectory(temporary.name)
+        self.directory.clear()
+        for pid, registry in ((101, worker_registry(2, 0.5, 3)),
+                              (102, worker_registry(3, 5, 4))):
+            with mock.patch('os.getpid', return_value=pid):
+                self.directory.save(registry)
+
+    def test_workers_are_summed(self):
+        text = render(self.directory.collect())
+        self.assertIn('requests_total{view="a"} 5.0', text)
+        self.assertIn('duration_seconds_bucket{le="1"} 1', text)
+        self.assertIn('duration_seconds_bucket{le="10"} 2', text)
+        self.assertIn('duration_seconds_count 2', text)
+        self.assertIn('connections{pid="101"} 3', text)
+        self.assertIn('connections{pid="102"} 4', text)
+
+    def test_exited_worker_is_archived(self):
+        self.directory.archive(101)
+        self.directory.archive(101)
+        text = render(self.directory.collect())
+        self.assertIn('requests_total{view="a"} 5.0', text)
+        self.assertIn('duration_seconds_count 2', text)
+        self.assertNotIn('pid="101"', text)
+        self.assertIn('connections{pid="102"} 4', text)
+
+
+class MetricsViewTests(SimpleTestCase):
+
+    def test_internal_request_is_allowed(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_proxied_request_is_forbidden(self):
+        response = self.client.get('/metrics',
+                                   HTTP_X_FORWARDED_FOR='203.0.113.1')
+        self.assertEqual(response.status_code, 403)
+
+    def test_public_address_is_forbidden(self):
+        response = self.client.get('/metrics', REMOTE_ADDR='8.8.8.8')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics',
+                                   HTTP_AUTHORIZATION='Bearer secret',
+                                   REMOTE_ADDR='8.8.8.8')
+        self.assertEqual(response.status_code, 200)
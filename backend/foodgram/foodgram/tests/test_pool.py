@@ -0,0 +1,70 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from psycopg2 import OperationalError, extensions
+
+from foodgram.db.postgresql_pool.base import ConnectionPool
+
+
+class FakeConnection:
+
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.closed = False
+        self.queries = 0
+        self.info = mock.Mock(
+            transaction_status=extensions.TRANSACTION_STATUS_IDLE
+        )
+
+    def cursor(self):
+        if not self.alive:
+            raise OperationalError('server closed the connection')
+        self.queries += 1
+        return mock.MagicMock()
+
+    def close(self):
+        self.closed = True
+
+
+@mock.patch('foodgram.db.postgresql_pool.base.time.monotonic')
+class ConnectionPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.pool = ConnectionPool(max_size=3, timeout=1)
+
+    def checkout(self, *connections):
+        new = FakeConnection()
+        for connection in connections:
+            self.pool.put(connection)
+        return self.pool.get(lambda: new), new
+
+    def test_recent_connection_is_not_checked(self, monotonic):
+        monotonic.return_value = 100
+        pooled = FakeConnection()
+        self.pool.get(lambda: pooled)
+        connection, _ = self.checkout(pooled)
+        self.assertIs(connection, pooled)
+        self.assertEqual(pooled.queries, 0)
+
+    def test_idle_connection_is_checked(self, monotonic):
+        monotonic.return_value = 100
+        pooled = FakeConnection()
+        self.pool.get(lambda: pooled)
+        self.pool.put(pooled)
+        monotonic.return_value = 200
+        self.assertIs(self.pool.get(FakeConnection), pooled)
+        self.assertEqual(pooled.queries, 1)
+
+    def test_dead_connections_are_discarded(self, monotonic):
+        monotonic.return_value = 100
+        alive, dead = FakeConnection(), FakeConnection(alive=False)
+        self.pool.get(lambda: alive)
+        self.pool.get(lambda: dead)
+        self.pool.put(alive)
+        self.pool.put(dead)
+        monotonic.return_value = 200
+        self.assertIs(self.pool.get(FakeConnection), alive)
+        self.assertTrue(dead.closed)
+        # Освободились все слоты, кроме выданного.
+        self.pool.get(FakeConnection)
+        self.pool.get(FakeConnection)
@@ -0,0 +1,28 @@
+from django.test import SimpleTestCase, override_settings
+
+from foodgram.db.router import ReplicaRouter, choose_replica, read_replica
+from recipes.models import Recipe
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2', 'replica3'])
+class ReplicaRouterTests(SimpleTestCase):
+
+    def test_reads_use_one_replica_per_request(self):
+        router = ReplicaRouter()
+        for _ in range(10):
+            token = read_replica.set(choose_replica())
+            try:
+                aliases = {router.db_for_read(Recipe) for _ in range(20)}
+            finally:
+                read_replica.reset(token)
+            self.assertEqual(len(aliases), 1)
+            self.assertIn(aliases.pop(), ('replica1', 'replica2', 'replica3'))
+
+    def test_default_outside_replica_requests(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Recipe), 'default')
+        self.assertEqual(router.db_for_write(Recipe), 'default')
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_no_replicas(self):
+        self.assertIsNone(choose_replica())
@@ -1,11 +1,19 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import TemplateView
 
+from api.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path('redoc/', TemplateView.as_view(template_name='redoc.html'),
          name='redoc'),
-    path("__debug__/", include('debug_toolbar.urls'))
 ]
+
+if settings.METRICS_ENABLED:
+    urlpatterns.append(path('metrics', metrics, name='metrics'))
+
+if settings.DEBUG:
+    urlpatterns.append(path('__debug__/', include('debug_toolbar.urls')))
@@ -0,0 +1,92 @@
+"""Настройки gunicorn для бэкенда.
+
+Значения по умолчанию можно переопределить переменными окружения
+GUNICORN_*.
+
+Поток /api/events/ занимает поток воркера на EVENTS_STREAM_TIMEOUT
+секунд, и при двух потоках на воркер несколько клиентов заняли бы весь
+API. Поэтому в docker-compose события отдаёт отдельный сервис events
+с тем же образом и большим числом потоков (GUNICORN_THREADS — сколько
+потоков событий держит один воркер), а nginx направляет туда только
+/api/events/.
+
+Метрики воркеров складываются через каталог METRICS_DIR (см.
+foodgram/metrics.py). Если он не задан, создаётся временный каталог
+на время работы gunicorn.
+"""
+import os
+import shutil
+import tempfile
+
+
+def _cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', _cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 2))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Django загружается в мастер-процессе один раз, воркеры получают
+# уже импортированные модули через fork (copy-on-write).
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Перезапуск воркеров со сдвигом, чтобы они не рестартовали одновременно.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+
+# Переменная окружения наследуется воркерами и попадает в settings.
+_temporary_metrics_dir = not os.getenv('METRICS_DIR')
+if _temporary_metrics_dir:
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='foodgram-metrics-')
+metrics_flush_seconds = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+
+
+def _metrics_directory():
+    from foodgram.metrics import MetricsDirectory
+
+    return MetricsDirectory(os.environ['METRICS_DIR'])
+
+
+def on_starting(server):
+    # Снимки прошлого запуска относятся к процессам, которых уже нет.
+    _metrics_directory().clear()
+
+
+def on_exit(server):
+    if _temporary_metrics_dir:
+        shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+
+
+def post_worker_init(worker):
+    from api.events import check_workers
+    from api.ingredient_index import INDEX
+    from foodgram.metrics import REGISTRY
+
+    # Ошибка здесь останавливает gunicorn до приёма запросов.
+    check_workers(worker.cfg.workers)
+    # Приложение уже загружено в воркере, индекс ингредиентов строится
+    # в фоне до первого поиска.
+    INDEX.start_rebuild()
+    _metrics_directory().start_saving(REGISTRY, metrics_flush_seconds)
+
+
+def worker_exit(server, worker):
+    from foodgram.metrics import REGISTRY
+
+    _metrics_directory().save(REGISTRY)
+
+
+def child_exit(server, worker):
+    # Вызывается в мастере после завершения воркера.
+    _metrics_directory().archive(worker.pid)
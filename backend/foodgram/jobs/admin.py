@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from .models import Job
+
+EMPTY_VALUE = 'пусто'
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'attempts', 'run_at',
+                    'created_at', 'finished_at')
+    search_fields = ('name', 'idempotency_key')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created_at', 'started_at', 'lease_until',
+                       'finished_at')
+    empty_value_display = EMPTY_VALUE
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs'
+    verbose_name = 'Фоновые задачи'
+
+    def ready(self):
+        from . import checks  # noqa: F401
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from foodgram.cache import is_cache_shared
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs=None, **kwargs):
+    """Процессы обмениваются данными через кэш default.
+
+    Задачи выполняются в отдельном процессе run_jobs: с кэшем в памяти
+    процесса готовые списки покупок и прогретые рецепты остаются в
+    run_jobs, а журнал изменений индекса ингредиентов (api) виден
+    только записавшему его воркеру.
+    """
+    if settings.DEBUG or is_cache_shared():
+        return []
+    return [Warning(
+        'Кэш default хранится в памяти процесса: результаты фоновых '
+        'задач и изменения рецептов для индекса ингредиентов не видны '
+        'другим процессам.',
+        hint='Задайте CACHE_BACKEND с общим кэшем, например '
+             'django.core.cache.backends.memcached.PyMemcacheCache.',
+        id='jobs.W001',
+    )]
@@ -0,0 +1,131 @@
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from foodgram.metrics import REGISTRY
+from jobs.models import Job
+from jobs.queue import claim, release_expired, renew, run
+
+# Как часто удаляются завершённые задачи, секунды.
+PRUNE_INTERVAL = 60
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_in_thread(job_id):
+    try:
+        return run(job_id)
+    finally:
+        # Поток пула живёт долго, соединение закрывается как после запроса.
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Runs background jobs from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="seconds between polls of an empty queue")
+        parser.add_argument(
+            '--stale-after', type=int, default=600,
+            help="seconds a claimed job stays leased; the worker renews "
+                 "the lease while the job runs, and an expired lease is "
+                 "queued again or failed after max_attempts"
+        )
+        parser.add_argument(
+            '--keep-finished', type=int, default=60 * 60 * 24 * 7,
+            help="seconds to keep done and failed jobs before deleting them"
+        )
+        parser.add_argument('--once', action='store_true',
+                            help="run the jobs that are due and exit")
+        parser.add_argument('--metrics-port', type=int,
+                            help="serve Prometheus metrics on this port")
+
+    def prune_finished(self, keep_finished):
+        Job.objects.filter(
+            status__in=(Job.DONE, Job.FAILED),
+            finished_at__lt=timezone.now() - timedelta(seconds=keep_finished),
+        ).delete()
+
+    def due_jobs(self, limit):
+        return list(Job.objects.filter(
+            status=Job.PENDING, run_at__lte=timezone.now()
+        ).order_by('run_at').values_list('id', flat=True)[:limit])
+
+    def handle(self, *args, **options):
+        autodiscover_modules('jobs')
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+        if options['metrics_port']:
+            server = ThreadingHTTPServer(
+                ('', options['metrics_port']), MetricsHandler
+            )
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        threads = options['threads']
+        lease = options['stale_after']
+        # Выполняемые задачи: future -> id задачи.
+        running = {}
+        pruned_at = None
+        with ThreadPoolExecutor(threads) as executor:
+            while not stop.is_set():
+                running = {future: job_id
+                           for future, job_id in running.items()
+                           if not future.done()}
+                # Цикл работает всё время жизни процесса, поэтому
+                # соединение, разорванное перезапуском базы, закрывается
+                # здесь, как после запроса.
+                close_old_connections()
+                try:
+                    claimed = self.poll(running, threads, lease)
+                    if pruned_at is None or (
+                        time.monotonic() - pruned_at > PRUNE_INTERVAL
+                    ):
+                        self.prune_finished(options['keep_finished'])
+                        pruned_at = time.monotonic()
+                except DatabaseError:
+                    logger.exception('Job queue poll failed')
+                    claimed = []
+                for job_id in claimed:
+                    running[executor.submit(run_in_thread, job_id)] = job_id
+                if options['once'] and not claimed and not running:
+                    break
+                if not claimed:
+                    stop.wait(options['poll_interval'])
+        connection.close()
+
+    def poll(self, running, threads, lease):
+        """Продлевает захват выполняемых задач и захватывает новые."""
+        if running:
+            renew(list(running.values()), lease)
+        release_expired()
+        return [
+            job_id
+            for job_id in self.due_jobs(threads - len(running))
+            if claim(job_id, lease)
+        ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2 on 2026-10-19 09:45
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def lease_running_jobs(apps, schema_editor):
+    # Прежний срок --stale-after по умолчанию, считая от запуска.
+    Job = apps.get_model('jobs', 'Job')
+    Job.objects.filter(status='running').update(
+        lease_until=F('started_at') + timedelta(seconds=600)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, help_text='Воркер продлевает срок, пока выполняет задачу.', null=True, verbose_name='Захвачена до'),
+        ),
+        migrations.RunPython(lease_running_jobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Задача в очереди, которую выполняет команда run_jobs."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(
+        'Название',
+        max_length=150,
+    )
+    payload = models.JSONField(
+        'Аргументы',
+        default=dict,
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    idempotency_key = models.CharField(
+        'Ключ идемпотентности',
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'Попытки',
+        default=0,
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        'Максимум попыток',
+        default=3,
+    )
+    run_at = models.DateTimeField(
+        'Запустить не раньше',
+        default=timezone.now,
+    )
+    created_at = models.DateTimeField(
+        'Дата создания',
+        auto_now_add=True,
+    )
+    started_at = models.DateTimeField(
+        'Дата запуска',
+        null=True,
+        blank=True,
+    )
+    lease_until = models.DateTimeField(
+        'Захвачена до',
+        null=True,
+        blank=True,
+        help_text='Воркер продлевает срок, пока выполняет задачу.',
+    )
+    finished_at = models.DateTimeField(
+        'Дата завершения',
+        null=True,
+        blank=True,
+    )
+    last_error = models.TextField(
+        'Последняя ошибка',
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        ordering = ('-created_at',)
+        indexes = [
+            models.Index(fields=('status', 'run_at'),
+                         name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.status})'
@@ -0,0 +1,164 @@
+"""Очередь фоновых задач в базе данных.
+
+Задача — функция, зарегистрированная декоратором @job в модуле jobs.py
+любого приложения. Веб-процесс только создаёт запись Job, выполняет её
+команда run_jobs. Аргументы задачи должны сериализоваться в JSON.
+"""
+import traceback
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from foodgram.metrics import COUNT_BUCKETS, REGISTRY
+from .models import Job
+
+JOBS = {}
+RETRY_DELAY = 10
+
+QUEUE_LATENCY = REGISTRY.histogram(
+    'foodgram_job_queue_latency_seconds',
+    'Время от готовности задачи к запуску до её старта.',
+)
+JOB_DURATION = REGISTRY.histogram(
+    'foodgram_job_duration_seconds',
+    'Время выполнения задачи.',
+)
+JOB_ATTEMPTS = REGISTRY.histogram(
+    'foodgram_job_attempts',
+    'Число попыток до завершения задачи.',
+    COUNT_BUCKETS,
+)
+JOBS_FINISHED = REGISTRY.counter(
+    'foodgram_jobs_finished_total',
+    'Завершённые попытки выполнения задач.',
+)
+
+
+def job(name):
+    """Регистрирует функцию как фоновую задачу с именем name."""
+    def decorator(function):
+        JOBS[name] = function
+        return function
+    return decorator
+
+
+def enqueue(name, idempotency_key=None, delay=0, max_attempts=3,
+            **payload):
+    """Ставит задачу в очередь после фиксации текущей транзакции.
+
+    Повторный вызов с тем же idempotency_key не создаёт новую задачу,
+    пока старая хранится в базе: завершённые задачи run_jobs удаляет
+    через --keep-finished секунд. Ключ должен строиться по данным
+    базы, а не по счётчикам в кэше, которые сбрасываются при перезапуске.
+    """
+    def create():
+        try:
+            with transaction.atomic():
+                Job.objects.create(
+                    name=name,
+                    payload=payload,
+                    idempotency_key=idempotency_key,
+                    max_attempts=max_attempts,
+                    run_at=timezone.now() + timedelta(seconds=delay),
+                )
+        except IntegrityError:
+            if idempotency_key is None:
+                raise
+    transaction.on_commit(create)
+
+
+def claim(job_id, lease):
+    """Помечает задачу выполняемой, если её не забрал другой воркер.
+
+    Задача захватывается на lease секунд, воркер продлевает захват
+    через renew(), пока её выполняет.
+    """
+    now = timezone.now()
+    return Job.objects.filter(id=job_id, status=Job.PENDING).update(
+        status=Job.RUNNING,
+        started_at=now,
+        lease_until=now + timedelta(seconds=lease),
+        attempts=F('attempts') + 1,
+    ) == 1
+
+
+def renew(job_ids, lease):
+    """Продлевает захват выполняемых задач."""
+    Job.objects.filter(id__in=job_ids, status=Job.RUNNING).update(
+        lease_until=timezone.now() + timedelta(seconds=lease)
+    )
+
+
+def release_expired():
+    """Возвращает в очередь задачи, захват которых истёк.
+
+    Захват истекает, если воркер умер или завис. Задачи, исчерпавшие
+    попытки, помечаются ошибкой: иначе задача, которая роняет воркер,
+    перезапускалась бы бесконечно.
+    """
+    expired = Job.objects.filter(status=Job.RUNNING,
+                                 lease_until__lt=timezone.now())
+    exhausted = dict(expired.filter(
+        attempts__gte=F('max_attempts')
+    ).values_list('id', 'name'))
+    if exhausted:
+        expired.filter(id__in=exhausted).update(
+            status=Job.FAILED,
+            finished_at=timezone.now(),
+            lease_until=None,
+            last_error='Захват задачи истёк: воркер завершился или завис.',
+        )
+        for name in exhausted.values():
+            JOBS_FINISHED.inc(name=name, result='expired')
+    return expired.update(status=Job.PENDING, lease_until=None)
+
+
+def run(job_id):
+    """Выполняет заранее захваченную задачу и записывает результат."""
+    instance = Job.objects.get(id=job_id)
+    QUEUE_LATENCY.observe(
+        max(0.0, (instance.started_at - instance.run_at).total_seconds()),
+        name=instance.name,
+    )
+    try:
+        function = JOBS[instance.name]
+        function(**instance.payload)
+    except Exception:
+        finished = timezone.now()
+        instance.last_error = traceback.format_exc()
+        if instance.attempts < instance.max_attempts:
+            instance.status = Job.PENDING
+            instance.run_at = finished + timedelta(
+                seconds=RETRY_DELAY * 2 ** (instance.attempts - 1)
+            )
+        else:
+            instance.status = Job.FAILED
+            instance.finished_at = finished
+    else:
+        instance.status = Job.DONE
+        instance.finished_at = timezone.now()
+    # Число попыток различает захваты: если захват истёк и задачу
+    # забрал другой воркер, результат этого запуска не записывается.
+    updated = Job.objects.filter(
+        id=instance.id, status=Job.RUNNING, attempts=instance.attempts
+    ).update(
+        status=instance.status,
+        run_at=instance.run_at,
+        finished_at=instance.finished_at,
+        last_error=instance.last_error,
+        lease_until=None,
+    )
+    if not updated:
+        JOBS_FINISHED.inc(name=instance.name, result='lost')
+        return 'lost'
+    JOB_DURATION.observe(
+        (timezone.now() - instance.started_at).total_seconds(),
+        name=instance.name,
+    )
+    result = 'retry' if instance.status == Job.PENDING else instance.status
+    JOBS_FINISHED.inc(name=instance.name, result=result)
+    if instance.status != Job.PENDING:
+        JOB_ATTEMPTS.observe(instance.attempts, name=instance.name)
+    return instance.status
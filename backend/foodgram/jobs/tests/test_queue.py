@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from jobs.management.commands.run_jobs import Command
+from jobs.models import Job
+from jobs.queue import JOBS, claim, release_expired, renew, run
+
+CALLS = []
+
+
+def record(**payload):
+    CALLS.append(payload)
+
+
+class LeaseTests(TestCase):
+
+    def setUp(self):
+        JOBS['test.record'] = record
+        self.addCleanup(JOBS.pop, 'test.record')
+        CALLS.clear()
+
+    def create_running(self, attempts, expired):
+        now = timezone.now()
+        return Job.objects.create(
+            name='test.record', status=Job.RUNNING, attempts=attempts,
+            started_at=now - timedelta(hours=1),
+            lease_until=now + timedelta(minutes=-1 if expired else 1),
+        )
+
+    def test_expired_leases(self):
+        retry = self.create_running(attempts=1, expired=True)
+        exhausted = self.create_running(attempts=3, expired=True)
+        alive = self.create_running(attempts=3, expired=False)
+        self.assertEqual(release_expired(), 1)
+        statuses = dict(Job.objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {
+            retry.id: Job.PENDING,
+            exhausted.id: Job.FAILED,
+            alive.id: Job.RUNNING,
+        })
+
+    def test_renewed_job_is_not_released(self):
+        job = self.create_running(attempts=1, expired=True)
+        renew([job.id], 60)
+        self.assertEqual(release_expired(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+
+    def test_result_of_lost_lease_is_dropped(self):
+        def stolen(job_id):
+            # Пока задача выполнялась, захват истёк и её забрал
+            # другой воркер.
+            Job.objects.filter(id=job_id).update(status=Job.PENDING)
+            claim(job_id, 60)
+
+        JOBS['test.stolen'] = stolen
+        self.addCleanup(JOBS.pop, 'test.stolen')
+        job = Job.objects.create(name='test.stolen')
+        job.payload = {'job_id': job.id}
+        job.save()
+        self.assertTrue(claim(job.id, 60))
+        self.assertEqual(run(job.id), 'lost')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.RUNNING, 2))
+
+    def test_poll_renews_running_and_claims_due(self):
+        running = self.create_running(attempts=1, expired=True)
+        due = Job.objects.create(name='test.record')
+        claimed = Command().poll({None: running.id}, threads=2, lease=60)
+        self.assertEqual(claimed, [due.id])
+        self.assertEqual(
+            Job.objects.filter(status=Job.RUNNING,
+                               lease_until__gt=timezone.now()).count(), 2
+        )
@@ -1,7 +1,10 @@
 from django.contrib import admin
 
+from foodgram.paginator import EstimatedCountPaginator
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
-                            Shoppingcart, Tag, Subscription)
+                            SharedShoppingList, Shoppingcart, Tag,
+                            Subscription, Tombstone)
+from recipes.signals import delete_user_recipes, touch_recipes
 
 EMPTY_VALUE = 'пусто'
 
@@ -18,51 +21,122 @@ class TagAdmin(admin.ModelAdmin):
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('pk', 'name', 'measurement_unit')
     search_fields = ('name',)
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
+    ordering = ('name',)
     empty_value_display = EMPTY_VALUE
 
 
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredients
+    autocomplete_fields = ('ingredient',)
+    extra = 1
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('pk', 'name', 'author', 'favorites_amount')
-    search_fields = ('name', 'author')
-    list_filter = ('name', 'author', 'tags')
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username')
+    list_filter = ('tags',)
+    autocomplete_fields = ('author',)
     empty_value_display = EMPTY_VALUE
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     inlines = [
         RecipeIngredientInline,
     ]
 
+    def save_related(self, request, form, formsets, change):
+        # Ингредиенты из inline сохраняются после рецепта.
+        super().save_related(request, form, formsets, change)
+        touch_recipes(Recipe.objects.filter(pk=form.instance.pk))
+
+    @admin.display(description='В избранном',
+                   ordering='favorites_count')
     def favorites_amount(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
+
+
+class UserRecipeAdmin(admin.ModelAdmin):
+    """Общие настройки для избранного и корзины."""
+    list_display = ('pk', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+    raw_id_fields = ('user', 'recipe')
+    empty_value_display = EMPTY_VALUE
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def delete_model(self, request, obj):
+        delete_user_recipes(self.model.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_user_recipes(queryset)
 
 
 @admin.register(RecipeIngredients)
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ('pk', 'recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
+    raw_id_fields = ('recipe', 'ingredient')
     empty_value_display = EMPTY_VALUE
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # Рецепт сохраняется целиком, чтобы обновились updated_at (кэш,
+    # ETag) и индекс ингредиентов, который слушает post_save рецепта.
+    def touch(self, recipe_ids):
+        for recipe in Recipe.objects.filter(pk__in=recipe_ids):
+            recipe.save(update_fields=('updated_at',))
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self.touch({obj.recipe_id})
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.touch({obj.recipe_id})
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        self.touch(recipe_ids)
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'user', 'recipe')
-    search_fields = ('user', 'recipe')
-    empty_value_display = EMPTY_VALUE
+class FavoriteAdmin(UserRecipeAdmin):
+    pass
 
 
 @admin.register(Shoppingcart)
-class ShoppingCartAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'user', 'recipe')
-    search_fields = ('user', 'recipe')
-    empty_value_display = EMPTY_VALUE
+class ShoppingCartAdmin(UserRecipeAdmin):
+    pass
 
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'author')
-    search_fields = ('user', 'author')
-    list_filter = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    raw_id_fields = ('user', 'author')
     empty_value_display = EMPTY_VALUE
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'model', 'object_id', 'owner', 'deleted_at')
+    list_filter = ('model',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(SharedShoppingList)
+class SharedShoppingListAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'token', 'created_at')
+    search_fields = ('user__username',)
+    raw_id_fields = ('user',)
@@ -0,0 +1,158 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from foodgram.batching import iterate_values, memory_report
+from foodgram.db import read_snapshot
+from recipes.models import (Favorite, Recipe, RecipeIngredients,
+                            RecipeSimilarity)
+
+
+def load_pairs(np, queryset, *fields):
+    """Пары id из базы в два массива без промежуточных списков."""
+    pairs = np.fromiter(
+        (value for row in iterate_values(queryset, *fields)
+         for value in row),
+        dtype=np.int64,
+    )
+    return pairs[0::2], pairs[1::2]
+
+
+def recipe_rows(np, recipe_ids, recipes, columns):
+    """Номера строк рецептов и соответствующие им столбцы.
+
+    Пары с рецептами, которых нет в recipe_ids, отбрасываются: иначе
+    searchsorted отнёс бы их к соседнему рецепту или за конец матрицы.
+    """
+    known = np.isin(recipes, recipe_ids)
+    return np.searchsorted(recipe_ids, recipes[known]), columns[known]
+
+
+def normalize_rows(np, sparse, matrix):
+    norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+class Command(BaseCommand):
+    help = 'Builds top-K similar recipes from favorites and ingredients'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=10)
+        parser.add_argument(
+            '--favorites-weight', type=float, default=0.7,
+            help="share of co-favorite similarity, the rest is ingredients"
+        )
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help="recipes per dense block of scores")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="rows per INSERT")
+
+    def log(self, message):
+        if self.verbosity > 0:
+            self.stdout.write(message)
+
+    def recipe_vectors(self, recipe_ids, weight):
+        """Векторы рецептов: пользователи, добавившие в избранное,
+        и ингредиенты с весом IDF.
+
+        Косинус между векторами — взвешенная сумма косинусов по
+        избранному и по ингредиентам.
+        """
+        np, sparse = self.np, self.sparse
+        size = len(recipe_ids)
+
+        recipes, users = recipe_rows(np, recipe_ids, *load_pairs(
+            np, Favorite.objects.all(), 'recipe_id', 'user_id'
+        ))
+        _, users = np.unique(users, return_inverse=True)
+        favorites = sparse.csr_matrix(
+            (np.ones(len(users)), (recipes, users)),
+            shape=(size, users.max(initial=-1) + 1),
+        )
+        favorites.data[:] = 1  # повторные добавления не усиливают связь
+
+        recipes, ingredients = recipe_rows(np, recipe_ids, *load_pairs(
+            np, RecipeIngredients.objects.all(), 'recipe_id', 'ingredient_id'
+        ))
+        _, ingredients = np.unique(ingredients, return_inverse=True)
+        composition = sparse.csr_matrix(
+            (np.ones(len(ingredients)), (recipes, ingredients)),
+            shape=(size, ingredients.max(initial=-1) + 1),
+        )
+        composition.data[:] = 1
+        # Соль и сахар есть почти везде и не должны делать рецепты похожими.
+        frequency = np.bincount(composition.indices,
+                                minlength=composition.shape[1])
+        idf = np.log((size + 1) / (frequency + 1))
+        composition = composition @ sparse.diags(idf)
+
+        return sparse.hstack([
+            normalize_rows(np, sparse, favorites) * np.sqrt(weight),
+            normalize_rows(np, sparse, composition) * np.sqrt(1 - weight),
+        ]).tocsr()
+
+    def top_neighbors(self, vectors, top_k, chunk_size):
+        """Top-K соседей по блокам, полная матрица не строится."""
+        np = self.np
+        size = vectors.shape[0]
+        top_k = min(top_k, size - 1)
+        transposed = vectors.T.tocsc()
+        for start in range(0, size, chunk_size):
+            stop = min(start + chunk_size, size)
+            scores = (vectors[start:stop] @ transposed).toarray()
+            scores[np.arange(stop - start), np.arange(start, stop)] = 0
+            neighbors = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+            for row, columns in enumerate(neighbors):
+                for column in columns:
+                    if scores[row, column] > 0:
+                        yield start + row, column, scores[row, column]
+
+    def handle(self, *args, **options):
+        # Тяжёлые зависимости нужны только этой команде.
+        import numpy
+        from scipy import sparse
+        self.np, self.sparse = numpy, sparse
+        self.verbosity = options['verbosity']
+        started = time.perf_counter()
+
+        # Рецепты и их связи читаются из одного снимка, чтобы id из
+        # связей совпадали со списком рецептов.
+        with read_snapshot():
+            recipe_ids = numpy.fromiter(
+                iterate_values(Recipe.objects.order_by('id'), 'id',
+                               flat=True),
+                dtype=numpy.int64,
+            )
+            if len(recipe_ids) < 2:
+                self.log('Not enough recipes')
+                return
+            vectors = self.recipe_vectors(recipe_ids,
+                                          options['favorites_weight'])
+        self.log(f'Vectors {vectors.shape}, {vectors.nnz} non-zero '
+                 f'({time.perf_counter() - started:.1f} s, '
+                 f'{memory_report()})')
+
+        with transaction.atomic():
+            RecipeSimilarity.objects.all().delete()
+            batch = []
+            total = 0
+            for row, column, score in self.top_neighbors(
+                vectors, options['top_k'], options['chunk_size']
+            ):
+                batch.append(RecipeSimilarity(
+                    recipe_id=int(recipe_ids[row]),
+                    similar_id=int(recipe_ids[column]),
+                    score=float(score),
+                ))
+                if len(batch) == options['batch_size']:
+                    RecipeSimilarity.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+            RecipeSimilarity.objects.bulk_create(batch)
+            total += len(batch)
+        self.log(f'{total} neighbors for {len(recipe_ids)} recipes '
+                 f'in {time.perf_counter() - started:.1f} s '
+                 f'({memory_report()})')
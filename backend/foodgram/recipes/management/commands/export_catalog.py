@@ -0,0 +1,87 @@
+import base64
+import json
+import mimetypes
+import sys
+import time
+
+from django.core.management import BaseCommand
+from django.db.models import prefetch_related_objects
+
+from foodgram.batching import iterate_batches, memory_report
+from recipes.models import Recipe
+
+
+def recipe_to_dict(recipe, embed_images):
+    image = recipe.image.name or None
+    if image and embed_images:
+        content_type = mimetypes.guess_type(image)[0] or 'image/png'
+        with recipe.image.open('rb') as file:
+            data = base64.b64encode(file.read()).decode()
+        image = f'data:{content_type};base64,{data}'
+    return {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'image': image,
+        'author': {
+            'username': recipe.author.username,
+            'email': recipe.author.email,
+            'first_name': recipe.author.first_name,
+            'last_name': recipe.author.last_name,
+        },
+        'tags': [
+            {'name': tag.name, 'color': tag.color, 'slug': tag.slug}
+            for tag in recipe.tags.all()
+        ],
+        'ingredients': [
+            {
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.recipeingredients.all()
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Exports recipes with authors, tags and ingredients as NDJSON'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str, default='-',
+                            help="file path, '-' for stdout")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--embed-images', action='store_true',
+            help="embed images as data URIs instead of MEDIA_ROOT paths"
+        )
+
+    def handle(self, *args, **options):
+        total = Recipe.objects.count()
+        exported = 0
+        started = time.perf_counter()
+        output = (sys.stdout if options['output'] == '-'
+                  else open(options['output'], 'w', encoding='utf-8'))
+        try:
+            for batch in iterate_batches(Recipe.objects.all(),
+                                         options['batch_size']):
+                prefetch_related_objects(
+                    batch, 'author', 'tags', 'recipeingredients__ingredient'
+                )
+                for recipe in batch:
+                    output.write(json.dumps(
+                        recipe_to_dict(recipe, options['embed_images']),
+                        ensure_ascii=False,
+                    ))
+                    output.write('\n')
+                exported += len(batch)
+                if options['verbosity'] > 0:
+                    self.stderr.write(
+                        f'Exported {exported}/{total} recipes '
+                        f'({time.perf_counter() - started:.1f} s, '
+                        f'{memory_report()})'
+                    )
+        finally:
+            if output is not sys.stdout:
+                output.close()
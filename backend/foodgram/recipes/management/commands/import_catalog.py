@@ -0,0 +1,272 @@
+import base64
+import json
+import mimetypes
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+
+from foodgram.batching import memory_report
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from users.models import User
+
+# Справочники загружаются один раз до запуска воркеров
+# и пополняются только в главном процессе.
+_ingredients = {}
+_tags = {}
+
+
+def load_catalog():
+    _ingredients.update(
+        ((name, unit), pk) for pk, name, unit in
+        Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+    )
+    _tags.update(Tag.objects.values_list('slug', 'id'))
+
+
+def resolve_ingredients(records):
+    missing = {
+        (item['name'], item['measurement_unit'])
+        for record in records for item in record['ingredients']
+    } - _ingredients.keys()
+    if missing:
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in missing
+        )
+        for pk, name, unit in Ingredient.objects.filter(
+            name__in={name for name, _ in missing}
+        ).values_list('id', 'name', 'measurement_unit'):
+            _ingredients.setdefault((name, unit), pk)
+
+
+def resolve_tags(records):
+    missing = {
+        tag['slug']: tag
+        for record in records for tag in record['tags']
+        if tag['slug'] not in _tags
+    }
+    if missing:
+        Tag.objects.bulk_create(
+            (Tag(**tag) for tag in missing.values()), ignore_conflicts=True
+        )
+        _tags.update(
+            Tag.objects.filter(slug__in=missing).values_list('slug', 'id')
+        )
+        # ignore_conflicts пропускает и теги, совпавшие с существующими
+        # по названию или цвету при другом slug.
+        skipped = missing.keys() - _tags.keys()
+        if skipped:
+            raise CommandError(
+                'Tags conflict with existing ones by name or color: '
+                + ', '.join(sorted(skipped))
+            )
+
+
+def resolve_authors(records):
+    authors = {record['author']['username']: record['author']
+               for record in records}
+    ids = dict(User.objects.filter(
+        username__in=authors
+    ).values_list('username', 'id'))
+    missing = authors.keys() - ids.keys()
+    if missing:
+        password = make_password(None)
+        User.objects.bulk_create(
+            (User(password=password, **authors[username])
+             for username in missing),
+            ignore_conflicts=True,
+        )
+        ids.update(User.objects.filter(
+            username__in=missing
+        ).values_list('username', 'id'))
+        skipped = missing - ids.keys()
+        if skipped:
+            raise CommandError(
+                'Authors conflict with existing users: '
+                + ', '.join(sorted(skipped))
+            )
+    return ids
+
+
+def resolve_batch(records):
+    """Заменяет ссылки в записях на id, создавая недостающие объекты."""
+    resolve_ingredients(records)
+    resolve_tags(records)
+    authors = resolve_authors(records)
+    return [
+        {
+            'author_id': authors[record['author']['username']],
+            'name': record['name'],
+            'text': record['text'],
+            'cooking_time': record['cooking_time'],
+            'image': record.get('image'),
+            'tag_ids': [_tags[tag['slug']] for tag in record['tags']],
+            'ingredients': [
+                (_ingredients[(item['name'], item['measurement_unit'])],
+                 item['amount'])
+                for item in record['ingredients']
+            ],
+        }
+        for record in records
+    ]
+
+
+def set_image(recipe, image):
+    if not image:
+        return
+    if not image.startswith('data:'):
+        # Путь внутри MEDIA_ROOT, файлы переносятся отдельно.
+        recipe.image.name = image
+        return
+    header, data = image.split(';base64,')
+    extension = mimetypes.guess_extension(header[len('data:'):]) or '.png'
+    recipe.image.save(
+        f'{uuid.uuid4().hex}{extension}',
+        ContentFile(base64.b64decode(data)),
+        save=False,
+    )
+
+
+def import_batch(records):
+    """Создаёт рецепты пачки в одной транзакции.
+
+    Рецепты, уже существующие у автора с тем же названием,
+    пропускаются, поэтому повторный импорт файла безопасен.
+    """
+    existing = set(Recipe.objects.filter(
+        author_id__in={record['author_id'] for record in records},
+        name__in={record['name'] for record in records},
+    ).values_list('author_id', 'name'))
+    recipe_ingredients = []
+    recipe_tags = []
+    created = 0
+    with transaction.atomic():
+        for record in records:
+            key = (record['author_id'], record['name'])
+            if key in existing:
+                continue
+            existing.add(key)
+            recipe = Recipe(
+                author_id=record['author_id'],
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+            )
+            set_image(recipe, record['image'])
+            recipe.save()
+            created += 1
+            recipe_ingredients.extend(
+                RecipeIngredients(recipe=recipe, ingredient_id=pk,
+                                  amount=amount)
+                for pk, amount in record['ingredients']
+            )
+            recipe_tags.extend(
+                Recipe.tags.through(recipe=recipe, tag_id=pk)
+                for pk in record['tag_ids']
+            )
+        RecipeIngredients.objects.bulk_create(recipe_ingredients)
+        Recipe.tags.through.objects.bulk_create(recipe_tags)
+    return len(records), created
+
+
+def read_batches(file, batch_size):
+    """Пачки разобранных строк NDJSON."""
+    batch = []
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            batch.append(json.loads(line))
+        except ValueError as error:
+            raise CommandError(f'Line {number}: {error}')
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Imports recipes from an NDJSON file made by export_catalog'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str,
+                            help="file path, '-' for stdin")
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="recipes per transaction")
+        parser.add_argument(
+            '--workers', type=int,
+            help="worker processes (default: 1 for SQLite, CPU count "
+                 "for other databases)"
+        )
+
+    def report(self, batch_result, position):
+        processed, created = batch_result
+        self.processed += processed
+        self.created += created
+        if self.verbosity > 0:
+            elapsed = time.perf_counter() - self.started
+            progress = (f', {position / self.size:.0%} of file'
+                        if self.size else '')
+            self.stderr.write(
+                f'Processed {self.processed} recipes, '
+                f'created {self.created}{progress} '
+                f'({self.processed / elapsed:.0f} recipes/s, '
+                f'{memory_report()})'
+            )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.processed = self.created = 0
+        workers = options['workers']
+        if workers is None:
+            workers = (1 if connection.vendor == 'sqlite'
+                       else multiprocessing.cpu_count())
+        if options['path'] == '-':
+            file, self.size = sys.stdin.buffer, None
+        else:
+            file = open(options['path'], 'rb')
+            self.size = os.path.getsize(options['path'])
+        self.started = time.perf_counter()
+        load_catalog()
+        try:
+            if workers > 1:
+                self.run_parallel(file, options['batch_size'], workers)
+            else:
+                for batch in read_batches(file, options['batch_size']):
+                    self.report(import_batch(resolve_batch(batch)),
+                                file.tell() if self.size else None)
+        finally:
+            if file is not sys.stdin.buffer:
+                file.close()
+        self.stdout.write(
+            f'Created {self.created} of {self.processed} recipes'
+        )
+
+    def run_parallel(self, file, batch_size, workers):
+        # Соединения не должны переходить в дочерние процессы.
+        connections.close_all()
+        pending = []
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            for batch in read_batches(file, batch_size):
+                # Главный процесс разрешает ссылки сам, чтобы воркеры
+                # не создавали одни и те же ингредиенты параллельно.
+                records = resolve_batch(batch)
+                pending.append((
+                    pool.apply_async(import_batch, (records,)),
+                    file.tell() if self.size else None,
+                ))
+                # Не больше двух пачек на воркер в памяти.
+                while len(pending) >= workers * 2:
+                    result, position = pending.pop(0)
+                    self.report(result.get(), position)
+            for result, position in pending:
+                self.report(result.get(), position)
@@ -1,14 +1,37 @@
 import csv
 
 from django.apps import apps
-from django.core.management import BaseCommand
-from django.shortcuts import get_object_or_404
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from foodgram.batching import chunked, memory_report
 
 MODELS_FIELDS = {}
 
 
+def resolve_foreign_keys(rows):
+    """Заменяет id из MODELS_FIELDS объектами одним запросом на поле."""
+    for field, model in MODELS_FIELDS.items():
+        values = {row[field] for row in rows if field in row}
+        if not values:
+            continue
+        objects = model.objects.in_bulk(values)
+        missing = [value for value in values
+                   if objects.get(model._meta.pk.to_python(value)) is None]
+        if missing:
+            raise CommandError(
+                f'{model.__name__} with pk {missing[0]} does not exist'
+            )
+        for row in rows:
+            if field in row:
+                row[field] = objects[model._meta.pk.to_python(row[field])]
+
+
 class Command(BaseCommand):
     help = 'Creating model objects according the file path specified'
+    # Проверки импортируют весь URLconf (DRF, djoser, фильтры),
+    # загрузке данных они не нужны.
+    requires_system_checks = []
 
     def add_arguments(self, parser):
         parser.add_argument('--path', type=str, help="file path")
@@ -18,16 +41,23 @@ class Command(BaseCommand):
             type=str,
             help="django app name that the model is connected to"
         )
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="rows per INSERT")
 
     def handle(self, *args, **options):
         file_path = options['path']
         model = apps.get_model(options['app_name'], options['model_name'])
+        created = 0
+        # Файл читается построчно, в памяти только текущая пачка.
         with open(file_path, 'rt', encoding='utf-8') as csv_file:
             reader = csv.DictReader(csv_file, delimiter=',')
-            for row in reader:
-                for field, value in row.items():
-                    if field in MODELS_FIELDS.keys():
-                        row[field] = get_object_or_404(
-                            MODELS_FIELDS[field], pk=value
-                        )
-                model.objects.create(**row)
+            for rows in chunked(reader, options['batch_size']):
+                resolve_foreign_keys(rows)
+                with transaction.atomic():
+                    model.objects.bulk_create(model(**row) for row in rows)
+                created += len(rows)
+        if options['verbosity'] > 0:
+            self.stdout.write(
+                f'Created {created} {model.__name__} objects '
+                f'({memory_report()})'
+            )
@@ -1,13 +1,34 @@
-import json
-
 from django.apps import apps
 from django.core.management import BaseCommand
+from django.db import transaction
+
+from foodgram.batching import chunked, iterate_json_array, memory_report
 
 MODELS_FIELDS = {}
 
 
+def new_objects(model, records):
+    """Записи пачки, которых ещё нет в базе, как в get_or_create."""
+    fields = sorted({field for record in records for field in record})
+    existing = set(model.objects.filter(**{
+        f'{fields[0]}__in': {record.get(fields[0]) for record in records}
+    }).values_list(*fields))
+    for record in records:
+        if set(record) != set(fields):
+            # Запись с другим набором полей проверяется отдельно.
+            model.objects.get_or_create(**record)
+            continue
+        key = tuple(record[field] for field in fields)
+        if key not in existing:
+            existing.add(key)
+            yield model(**record)
+
+
 class Command(BaseCommand):
     help = 'Creating model objects according the file path specified'
+    # Проверки импортируют весь URLconf (DRF, djoser, фильтры),
+    # загрузке данных они не нужны.
+    requires_system_checks = []
 
     def add_arguments(self, parser):
         parser.add_argument('--path', type=str, help="file path")
@@ -17,11 +38,23 @@ class Command(BaseCommand):
             type=str,
             help="django app name that the model is connected to"
         )
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="objects per INSERT")
 
     def handle(self, *args, **options):
         file_path = options['path']
         model = apps.get_model(options['app_name'], options['model_name'])
+        created = 0
+        # Массив разбирается по элементам, файл целиком не читается.
         with open(file_path, 'rt', encoding='utf-8') as json_file:
-            data = json.loads(json_file.read())
-            for value in data:
-                model.objects.get_or_create(**value)
+            for records in chunked(iterate_json_array(json_file),
+                                   options['batch_size']):
+                with transaction.atomic():
+                    created += len(model.objects.bulk_create(
+                        new_objects(model, records)
+                    ))
+        if options['verbosity'] > 0:
+            self.stdout.write(
+                f'Created {created} {model.__name__} objects '
+                f'({memory_report()})'
+            )
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from recipes.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = 'Deletes tombstones older than SYNC_TOMBSTONE_TTL'
+    requires_system_checks = []
+
+    def handle(self, *args, **options):
+        deleted, _ = Tombstone.objects.filter(
+            deleted_at__lt=timezone.now() - timedelta(
+                seconds=settings.SYNC_TOMBSTONE_TTL
+            )
+        ).delete()
+        if options['verbosity'] > 0:
+            self.stdout.write(f'Deleted {deleted} tombstones')
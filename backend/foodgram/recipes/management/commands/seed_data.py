@@ -0,0 +1,295 @@
+import csv
+import io
+import multiprocessing
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            Shoppingcart, Subscription, Tag)
+from recipes.signals import recount_favorites
+from users.models import User
+
+DEFAULT_INGREDIENTS_PATH = (
+    settings.BASE_DIR.parent.parent / 'data' / 'ingredients.csv'
+)
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей', 'Елена',
+               'Дмитрий', 'Наталья', 'Алексей', 'Татьяна', 'Михаил')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев',
+              'Петров', 'Соколов', 'Михайлов', 'Новиков', 'Фёдоров')
+DISHES = ('Суп', 'Салат', 'Запеканка', 'Рагу', 'Пирог', 'Омлет', 'Каша',
+          'Паста', 'Плов', 'Гуляш', 'Десерт', 'Смузи')
+TAGS = (('Завтрак', 'breakfast'), ('Обед', 'lunch'), ('Ужин', 'dinner'),
+        ('Супы', 'soups'), ('Салаты', 'salads'), ('Десерты', 'desserts'),
+        ('Закуски', 'snacks'), ('Выпечка', 'bakery'))
+
+# Списки id заполняются до запуска воркеров и наследуются ими при fork.
+_ids = {}
+
+
+def write_rows(model, fields, rows, use_copy):
+    """Пишет строки пачкой: через COPY в PostgreSQL или bulk_create."""
+    if not rows:
+        return 0
+    if use_copy:
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(map(str, row)))
+            buffer.write('\n')
+        buffer.seek(0)
+        columns = ', '.join(
+            model._meta.get_field(field).column for field in fields
+        )
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {model._meta.db_table} ({columns}) FROM STDIN',
+                buffer,
+            )
+    else:
+        model.objects.bulk_create(
+            (model(**dict(zip(fields, row))) for row in rows),
+            batch_size=len(rows),
+        )
+    return len(rows)
+
+
+def recipe_ingredient_rows(rng, recipe_ids, options):
+    count = min(options['ingredients_per_recipe'], len(_ids['ingredient']))
+    for recipe_id in recipe_ids:
+        for ingredient_id in rng.sample(_ids['ingredient'], count):
+            yield recipe_id, ingredient_id, rng.randint(1, 500)
+
+
+def recipe_tag_rows(rng, recipe_ids, options):
+    count = min(options['tags_per_recipe'], len(_ids['tag']))
+    for recipe_id in recipe_ids:
+        for tag_id in rng.sample(_ids['tag'], count):
+            yield recipe_id, tag_id
+
+
+def user_recipe_rows(option):
+    # COPY не заполняет auto_now_add, поэтому created_at передаётся явно.
+    def rows(rng, user_ids, options):
+        count = min(options[option], len(_ids['recipe']))
+        for user_id in user_ids:
+            for recipe_id in rng.sample(_ids['recipe'], count):
+                yield user_id, recipe_id, options['created_at']
+    return rows
+
+
+def subscription_rows(rng, user_ids, options):
+    count = min(options['subscriptions'], len(_ids['user']))
+    for user_id in user_ids:
+        for author_id in rng.sample(_ids['user'], count):
+            if author_id != user_id:
+                yield user_id, author_id
+
+
+RELATIONS = {
+    'recipe_ingredients': (
+        'recipe', RecipeIngredients,
+        ('recipe_id', 'ingredient_id', 'amount'), recipe_ingredient_rows,
+        'ingredients_per_recipe',
+    ),
+    'recipe_tags': (
+        'recipe', Recipe.tags.through,
+        ('recipe_id', 'tag_id'), recipe_tag_rows,
+        'tags_per_recipe',
+    ),
+    'favorites': (
+        'user', Favorite,
+        ('user_id', 'recipe_id', 'created_at'),
+        user_recipe_rows('favorites'),
+        'favorites',
+    ),
+    'carts': (
+        'user', Shoppingcart,
+        ('user_id', 'recipe_id', 'created_at'), user_recipe_rows('carts'),
+        'carts',
+    ),
+    'subscriptions': (
+        'user', Subscription,
+        ('user_id', 'author_id'), subscription_rows,
+        'subscriptions',
+    ),
+}
+
+
+def seed_relation_chunk(job):
+    """Генерирует и записывает одну пачку связей.
+
+    Генератор случайных чисел зависит только от seed и номера пачки,
+    поэтому результат не зависит от числа воркеров.
+    """
+    relation, index, start, stop, options = job
+    owner, model, fields, generate, _ = RELATIONS[relation]
+    rng = random.Random(f'{options["seed"]}:{relation}:{index}')
+    rows = list(generate(rng, _ids[f'new_{owner}'][start:stop], options))
+    with transaction.atomic():
+        return relation, write_rows(model, fields, rows, options['copy'])
+
+
+class Command(BaseCommand):
+    help = 'Generates a reproducible synthetic dataset for load testing'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=len(TAGS))
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--tags-per-recipe', type=int, default=2)
+        parser.add_argument('--favorites', type=int, default=50,
+                            help="favorites per user")
+        parser.add_argument('--carts', type=int, default=10,
+                            help="shopping cart recipes per user")
+        parser.add_argument('--subscriptions', type=int, default=20,
+                            help="subscriptions per user")
+        parser.add_argument('--ingredients-csv', type=str,
+                            default=str(DEFAULT_INGREDIENTS_PATH))
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help="rows per batch")
+        parser.add_argument(
+            '--workers', type=int,
+            help="worker processes (default: 1 for SQLite, CPU count "
+                 "for other databases)"
+        )
+        parser.add_argument(
+            '--no-copy', dest='copy', action='store_false',
+            help="use bulk_create instead of COPY on PostgreSQL"
+        )
+
+    def log(self, message):
+        if self.verbosity > 0:
+            self.stdout.write(message)
+
+    def seed_catalog(self, options):
+        if not Ingredient.objects.exists():
+            with open(options['ingredients_csv'],
+                      encoding='utf-8') as csv_file:
+                Ingredient.objects.bulk_create(
+                    Ingredient(name=name, measurement_unit=unit)
+                    for name, unit in csv.reader(csv_file)
+                )
+        tags = []
+        for index in range(Tag.objects.count(), options['tags']):
+            name, slug = (TAGS[index] if index < len(TAGS)
+                          else (f'Тег {index}', f'tag-{index}'))
+            tags.append(Tag(name=name, slug=f'seed-{slug}',
+                            color=f'#{index:06x}'))
+        Tag.objects.bulk_create(tags)
+        _ids['ingredient'] = list(
+            Ingredient.objects.values_list('id', flat=True)
+        )
+        _ids['tag'] = list(Tag.objects.values_list('id', flat=True))
+
+    def seed_users(self, rng, options):
+        last_id = User.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        offset = User.objects.count()
+        password = make_password(None)
+        batch_size = options['batch_size']
+        for start in range(0, options['users'], batch_size):
+            User.objects.bulk_create(
+                User(
+                    username=f'seed_user{offset + index}',
+                    email=f'seed_user{offset + index}@example.com',
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    password=password,
+                )
+                for index in range(
+                    start, min(start + batch_size, options['users'])
+                )
+            )
+        _ids['user'] = list(User.objects.values_list('id', flat=True))
+        _ids['new_user'] = list(
+            User.objects.filter(id__gt=last_id).values_list('id', flat=True)
+        )
+
+    def seed_recipes(self, rng, options):
+        last_id = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        authors = _ids['new_user'] or _ids['user']
+        names = list(
+            Ingredient.objects.values_list('name', flat=True)[:500]
+        )
+        batch_size = options['batch_size']
+        for start in range(0, options['recipes'], batch_size):
+            Recipe.objects.bulk_create(
+                Recipe(
+                    author_id=rng.choice(authors),
+                    name=f'{rng.choice(DISHES)}: {rng.choice(names)}',
+                    text=' '.join(rng.choices(names, k=30)),
+                    cooking_time=rng.randint(5, 240),
+                )
+                for _ in range(
+                    start, min(start + batch_size, options['recipes'])
+                )
+            )
+        _ids['recipe'] = list(Recipe.objects.values_list('id', flat=True))
+        _ids['new_recipe'] = list(
+            Recipe.objects.filter(id__gt=last_id).values_list(
+                'id', flat=True
+            )
+        )
+
+    def relation_jobs(self, options):
+        # Связи создаются только для новых пользователей и рецептов,
+        # поэтому повторный запуск не порождает дубликатов.
+        for relation, (owner, _, _, _, per_item) in RELATIONS.items():
+            ids = _ids[f'new_{owner}']
+            step = max(1, options['batch_size'] // max(1, options[per_item]))
+            for index, start in enumerate(range(0, len(ids), step)):
+                yield relation, index, start, start + step, options
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        options['copy'] = options['copy'] and connection.vendor == 'postgresql'
+        options['created_at'] = timezone.now()
+        workers = options['workers']
+        if workers is None:
+            workers = (1 if connection.vendor == 'sqlite'
+                       else multiprocessing.cpu_count())
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+
+        self.seed_catalog(options)
+        self.seed_users(rng, options)
+        self.seed_recipes(rng, options)
+        totals = {
+            'users': len(_ids['new_user']),
+            'recipes': len(_ids['new_recipe']),
+        }
+        self.log(f'Users and recipes: {totals}')
+
+        jobs = self.relation_jobs(options)
+        if workers > 1:
+            # Соединения не должны переходить в дочерние процессы.
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(workers) as pool:
+                results = list(pool.imap_unordered(seed_relation_chunk, jobs))
+        else:
+            results = [seed_relation_chunk(job) for job in jobs]
+        for relation, count in results:
+            totals[relation] = totals.get(relation, 0) + count
+        # bulk_create и COPY не отправляют сигналы, счётчик
+        # избранного пересчитывается одним запросом.
+        recount_favorites(Recipe.objects.all())
+
+        elapsed = time.perf_counter() - started
+        rows = sum(totals.values())
+        self.log(f'Rows written: {totals}')
+        self.log(
+            f'{rows} rows in {elapsed:.1f} s '
+            f'({rows / elapsed * 60:,.0f} rows/min, {workers} workers)'
+        )
@@ -0,0 +1,47 @@
+# Generated by Django 3.2 on 2026-10-19 08:59
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_favorites(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    Recipe.objects.update(favorites_count=Coalesce(Subquery(
+        Favorite.objects.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe'
+        ).annotate(count=Count('id')).values('count')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipesimilarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.RunPython(count_favorites, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', 'recipe'], name='favorite_user_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['cooking_time', 'id'], name='recipe_cooking_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['favorites_count', 'id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['user', 'recipe'], name='shoppingcart_user_recipe_idx'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 3.2 on 2026-10-19 11:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=32, verbose_name='Модель')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Id объекта')),
+                ('owner', models.PositiveIntegerField(blank=True, null=True, verbose_name='Id пользователя')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удалённый объект',
+                'verbose_name_plural': 'Удалённые объекты',
+            },
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата изменения'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата изменения'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='favorite_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['updated_at', 'id'], name='ingredient_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['updated_at', 'id'], name='recipe_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='shoppingcart_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['updated_at', 'id'], name='tag_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['model', 'owner', 'deleted_at'], name='tombstone_model_owner_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-19 09:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0006_sync_timestamps_tombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SharedShoppingList',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=16, unique=True, verbose_name='Токен')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='shared_shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Общий список покупок',
+                'verbose_name_plural': 'Общие списки покупок',
+            },
+        ),
+    ]
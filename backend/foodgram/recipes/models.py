@@ -22,10 +22,18 @@ class Tag(models.Model):
         max_length=56,
         unique=True,
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
 
     class Meta:
         verbose_name = 'Тег'
         verbose_name_plural = 'Теги'
+        indexes = [
+            models.Index(fields=['updated_at', 'id'],
+                         name='tag_updated_at_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -41,10 +49,18 @@ class Ingredient(models.Model):
         'Единица измерения',
         max_length=56,
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
 
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        indexes = [
+            models.Index(fields=['updated_at', 'id'],
+                         name='ingredient_updated_at_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -83,11 +99,30 @@ class Recipe(models.Model):
     text = models.TextField(
         'Текст',
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ['-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        # Сортировки RecipeFilter: второе поле — id в том же
+        # направлении, поэтому индекс читается в любую сторону.
+        indexes = [
+            models.Index(fields=['cooking_time', 'id'],
+                         name='recipe_cooking_time_idx'),
+            models.Index(fields=['favorites_count', 'id'],
+                         name='recipe_favorites_count_idx'),
+            models.Index(fields=['updated_at', 'id'],
+                         name='recipe_updated_at_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -134,11 +169,21 @@ class Shoppingcart(models.Model):
         on_delete=models.CASCADE,
         related_name='shoppingrecipe',
     )
+    created_at = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+    )
 
     class Meta:
         ordering = ['-id']
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзины'
+        indexes = [
+            models.Index(fields=['user', 'recipe'],
+                         name='shoppingcart_user_recipe_idx'),
+            models.Index(fields=['user', 'created_at', 'id'],
+                         name='shoppingcart_user_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} добавил {self.recipe.name} в корзину.'
@@ -156,11 +201,21 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name='favoriterecipe',
     )
+    created_at = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+    )
 
     class Meta:
         ordering = ['-id']
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранные'
+        indexes = [
+            models.Index(fields=['user', 'recipe'],
+                         name='favorite_user_recipe_idx'),
+            models.Index(fields=['user', 'created_at', 'id'],
+                         name='favorite_user_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} добавил {self.recipe.name} в избраннное.'
@@ -193,3 +248,106 @@ class Subscription(models.Model):
 
     def __str__(self):
         return f'{self.user.username} подписался на {self.author.username}.'
+
+
+class RecipeSimilarity(models.Model):
+    """Ближайшие соседи рецепта, считаются командой build_recommendations."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarities',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(
+        'Сходство',
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_recipe_similar',
+            )
+        ]
+        indexes = [
+            models.Index(fields=['similar', 'recipe'],
+                         name='similarity_similar_idx'),
+        ]
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+    def __str__(self):
+        return f'{self.recipe_id} → {self.similar_id} ({self.score:.3f})'
+
+
+class Tombstone(models.Model):
+    """Запись об удалённом объекте для дельта-синхронизации клиентов.
+
+    Для избранного и корзины object_id — id рецепта, owner — id
+    пользователя. owner не внешний ключ: записи создаются при удалении
+    пользователя, когда ссылаться на него уже нельзя.
+    """
+    model = models.CharField(
+        'Модель',
+        max_length=32,
+    )
+    object_id = models.PositiveBigIntegerField(
+        'Id объекта',
+    )
+    owner = models.PositiveIntegerField(
+        'Id пользователя',
+        null=True,
+        blank=True,
+    )
+    deleted_at = models.DateTimeField(
+        'Дата удаления',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Удалённый объект'
+        verbose_name_plural = 'Удалённые объекты'
+        indexes = [
+            models.Index(fields=['model', 'owner', 'deleted_at'],
+                         name='tombstone_model_owner_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}'
+
+
+class SharedShoppingList(models.Model):
+    """Публичная ссылка на список покупок пользователя.
+
+    Список хранится статическим файлом с именем token в MEDIA_ROOT
+    и отдаётся nginx без обращения к бэкенду.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shared_shopping_list',
+        verbose_name='Пользователь',
+    )
+    token = models.CharField(
+        'Токен',
+        max_length=16,
+        unique=True,
+    )
+    created_at = models.DateTimeField(
+        'Дата создания',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Общий список покупок'
+        verbose_name_plural = 'Общие списки покупок'
+
+    def __str__(self):
+        return f'{self.user.username}: {self.token}'
@@ -0,0 +1,168 @@
+"""Обновление Recipe.updated_at при изменении связанных данных.
+
+По updated_at строятся ключи кэша и ETag рецепта, поэтому он должен
+меняться при любом изменении, видимом в API. Ингредиенты рецепта
+меняются целиком в RecipePostSerializer и в админке, которые сами
+сохраняют рецепт. Построчный обработчик RecipeIngredients давал бы
+UPDATE на каждую строку и отключал быстрое каскадное удаление.
+
+По updated_at и по журналу Tombstone клиенты получают изменения
+через api/sync.py.
+"""
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .models import (Favorite, Ingredient, Recipe, Shoppingcart, Tag,
+                     Tombstone)
+
+# Поля, которые меняются при каждом входе в систему и не попадают
+# в API. Пароль сюда не входит: его смена должна сбрасывать токены.
+SERVICE_USER_FIELDS = {'last_login'}
+
+# Строки избранного или корзины удалены через delete_user_recipes:
+# sender — модель, rows — пары (id пользователя, id рецепта).
+user_recipes_deleted = Signal()
+
+
+def touch_recipes(queryset):
+    queryset.update(updated_at=timezone.now())
+
+
+def recount_favorites(queryset):
+    """Пересчитывает favorites_count по таблице избранного."""
+    queryset.update(favorites_count=Coalesce(Subquery(
+        Favorite.objects.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe'
+        ).annotate(count=Count('id')).values('count')
+    ), 0))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        touch_recipes(Recipe.objects.filter(pk=instance.pk))
+    elif pk_set:
+        touch_recipes(Recipe.objects.filter(pk__in=pk_set))
+    else:
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Tag)
+def tag_changed(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+# Каскадное удаление связей с тегом не отправляет m2m_changed.
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(Recipe.objects.filter(ingredients=instance))
+
+
+# Строки RecipeIngredients удаляются вместе с ингредиентом каскадом.
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or (update_fields and set(update_fields)
+                   <= SERVICE_USER_FIELDS):
+        return
+    touch_recipes(Recipe.objects.filter(author=instance))
+
+
+# Счётчик не влияет на представление рецепта, поэтому updated_at
+# при его изменении не обновляется.
+@receiver(post_save, sender=Favorite)
+def favorite_added(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            favorites_count=F('favorites_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+def catalog_object_deleted(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        model=sender._meta.model_name, object_id=instance.pk
+    )
+
+
+def create_user_recipe_tombstones(model, rows):
+    """Записи об удалении строк избранного или корзины одним INSERT.
+
+    rows — пары (id пользователя, id рецепта).
+    """
+    Tombstone.objects.bulk_create(
+        Tombstone(model=model._meta.model_name, object_id=recipe_id,
+                  owner=user_id)
+        for user_id, recipe_id in rows
+    )
+
+
+def delete_user_recipes(queryset):
+    """Удаляет строки избранного или корзины и отправляет
+    user_recipes_deleted.
+
+    Обработчиков post_delete у этих моделей нет: с ними каскад при
+    удалении рецепта или пользователя выбирал бы каждую строку и
+    обрабатывал её отдельно, а без них это один DELETE.
+    """
+    rows = list(queryset.values_list('user_id', 'recipe_id'))
+    queryset.delete()
+    if rows:
+        user_recipes_deleted.send(sender=queryset.model, rows=rows)
+
+
+@receiver(user_recipes_deleted)
+def user_recipes_removed(sender, rows, **kwargs):
+    create_user_recipe_tombstones(sender, rows)
+    if sender is Favorite:
+        recount_favorites(Recipe.objects.filter(
+            pk__in={recipe_id for _, recipe_id in rows}
+        ))
+
+
+# Избранное и корзины рецепта удаляются каскадом без сигналов.
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    for model in (Favorite, Shoppingcart):
+        rows = list(model.objects.filter(recipe=instance).values_list(
+            'user_id', 'recipe_id'
+        ))
+        if rows:
+            create_user_recipe_tombstones(model, rows)
+
+
+# Избранное пользователя удаляется каскадом без сигналов, счётчики
+# чужих рецептов пересчитываются после удаления.
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleting(sender, instance, **kwargs):
+    instance.favorited_recipe_ids = list(Favorite.objects.filter(
+        user=instance
+    ).exclude(recipe__author=instance).values_list('recipe_id', flat=True))
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleted(sender, instance, **kwargs):
+    recipe_ids = getattr(instance, 'favorited_recipe_ids', None)
+    if recipe_ids:
+        recount_favorites(Recipe.objects.filter(pk__in=recipe_ids))
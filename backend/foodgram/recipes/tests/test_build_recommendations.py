@@ -0,0 +1,32 @@
+import numpy
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from recipes.management.commands.build_recommendations import recipe_rows
+from recipes.models import Recipe, RecipeSimilarity
+
+
+class RecipeRowsTests(SimpleTestCase):
+
+    def test_unknown_recipes_are_dropped(self):
+        rows, columns = recipe_rows(
+            numpy, numpy.array([10, 20, 30]),
+            numpy.array([20, 15, 30, 40, 10]), numpy.array([1, 2, 3, 4, 5]),
+        )
+        self.assertEqual(rows.tolist(), [1, 2, 0])
+        self.assertEqual(columns.tolist(), [1, 3, 5])
+
+
+class BuildRecommendationsTests(TestCase):
+
+    def test_neighbors_reference_existing_recipes(self):
+        call_command('seed_data', users=10, recipes=30, favorites=5,
+                     carts=0, subscriptions=0, workers=1, verbosity=0)
+        call_command('build_recommendations', top_k=3, verbosity=0)
+        self.assertTrue(RecipeSimilarity.objects.exists())
+        recipe_ids = set(Recipe.objects.values_list('id', flat=True))
+        for recipe_id, similar_id in RecipeSimilarity.objects.values_list(
+            'recipe_id', 'similar_id'
+        ):
+            self.assertIn(similar_id, recipe_ids)
+            self.assertNotEqual(recipe_id, similar_id)
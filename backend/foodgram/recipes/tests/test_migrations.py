@@ -0,0 +1,52 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class RecipeMigrationTests(TransactionTestCase):
+    """Миграции 0003–0007 применяются и откатываются на данных."""
+
+    before = [('recipes', '0004_recipesimilarity')]
+    after = [('recipes', '0007_sharedshoppinglist')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(self.after)
+
+    def test_rollback_to_initial_schema(self):
+        self.migrate([('recipes', '0002_alter_ingredient_name')])
+        apps = self.migrate(self.after)
+        self.assertTrue(apps.get_model('recipes', 'Tombstone'))
+
+    def test_favorites_count_is_backfilled(self):
+        apps = self.migrate(self.before)
+        User = apps.get_model('users', 'User')
+        Recipe = apps.get_model('recipes', 'Recipe')
+        Favorite = apps.get_model('recipes', 'Favorite')
+        users = [
+            User.objects.create(username=f'user{number}',
+                                email=f'user{number}@example.com')
+            for number in range(3)
+        ]
+        popular, other, unused = (
+            Recipe.objects.create(author=users[0], name=name, text=name,
+                                  cooking_time=5, image='recipe.png')
+            for name in ('popular', 'other', 'unused')
+        )
+        for user in users:
+            Favorite.objects.create(user=user, recipe=popular)
+        Favorite.objects.create(user=users[0], recipe=other)
+
+        apps = self.migrate(self.after)
+        Recipe = apps.get_model('recipes', 'Recipe')
+        self.assertEqual(
+            dict(Recipe.objects.values_list('name', 'favorites_count')),
+            {'popular': 3, 'other': 1, 'unused': 0},
+        )
+        Favorite = apps.get_model('recipes', 'Favorite')
+        self.assertFalse(Favorite.objects.filter(created_at=None).exists())
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from foodgram.paginator import EstimatedCountPaginator
 from .models import User
 
 EMPTY_VALUE = 'пусто'
@@ -9,5 +10,7 @@ EMPTY_VALUE = 'пусто'
 class UserAdmin(admin.ModelAdmin):
     list_display = ('pk', 'email', 'username', 'first_name', 'last_name')
     search_fields = ('username', 'email', 'first_name', 'last_name')
-    list_filter = ('username', 'email')
+    list_filter = ('role', 'is_active')
     empty_value_display = EMPTY_VALUE
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False